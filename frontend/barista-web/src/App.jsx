@@ -40,12 +40,13 @@ export default function App() {
 
     async function startOrder(orderId) {
         await apiJson(`/kitchen/orders/${orderId}/start`, { method: "POST" });
-        loadQueue();
+        // в live-режиме изменение придёт по стриму
+        if (!autoRefresh) loadQueue();
     }
 
     async function completeOrder(orderId) {
         await apiJson(`/kitchen/orders/${orderId}/complete`, { method: "POST" });
-        loadQueue();
+        if (!autoRefresh) loadQueue();
     }
 
     /* ===================== RECIPES ===================== */
@@ -117,10 +118,31 @@ export default function App() {
         loadIngredients();
     }, []);
 
+    // live-очередь: сервер шлёт снимок, затем только изменения (SSE)
     useEffect(() => {
         if (!autoRefresh) return;
-        const id = setInterval(loadQueue, 7000);
-        return () => clearInterval(id);
+        const source = new EventSource(`${API_BASE}/kitchen/orders/stream`);
+
+        source.addEventListener("snapshot", (e) => {
+            setQueue(JSON.parse(e.data));
+            setQueueError("");
+        });
+        source.addEventListener("ticket", (e) => {
+            const ticket = JSON.parse(e.data);
+            setQueue((prev) => {
+                const rest = prev.filter((o) => o.order_id !== ticket.order_id);
+                if (ticket.status === "DONE") return rest;
+                // на своё место по created_at, как в снимке, а не в конец
+                const at = rest.findIndex((o) => o.created_at > ticket.created_at);
+                return at === -1
+                    ? [...rest, ticket]
+                    : [...rest.slice(0, at), ticket, ...rest.slice(at)];
+            });
+        });
+        // EventSource переподключается сам и получит свежий снимок
+        source.onerror = () => setQueueError("Соединение с очередью потеряно, переподключаемся…");
+
+        return () => source.close();
     }, [autoRefresh]);
 
     useEffect(() => {
@@ -432,7 +454,7 @@ export default function App() {
                                         checked={autoRefresh}
                                         onChange={(e) => setAutoRefresh(e.target.checked)}
                                     />
-                                    автообновление каждые 7 секунд
+                                    live-обновление
                                 </label>
                             </div>
 
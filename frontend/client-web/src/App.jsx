@@ -20,7 +20,8 @@ function statusRu(kitchenStatus) {
     // NEW -> "Создан (ожидает принятия)"
     // IN_PROGRESS -> "Готовится"
     // COMPLETED -> "Готов к выдаче"
-    if (!kitchenStatus) return "—";
+    // UNKNOWN — заказ старше истории заказов, статус кухни по нему не известен
+    if (!kitchenStatus || kitchenStatus === "UNKNOWN") return "—";
     const s = String(kitchenStatus).toUpperCase();
     if (s === "NEW") return "Создан (ожидает принятия)";
     if (s === "IN_PROGRESS") return "Готовится";
@@ -205,46 +206,25 @@ export default function App() {
         return apiJson(`${ORDERS_BASE}/${orderId}`, {}, token);
     }
 
-    async function fetchKitchenStatus(orderId) {
-        // Здесь тянем статус именно из kitchen-service
-        // Если эндпоинт отличается — скажи, поправим в одном месте.
-        return apiJson(`/kitchen/orders/${orderId}`, {}, token);
-    }
-
     async function loadMyOrders() {
         setLoadingOrders(true);
         setError("");
         try {
-            // 1) Берём список заказов текущего пользователя из order-service
-            // ВАЖНО: путь должен соответствовать твоему nginx:
-            // /api/orders/ -> order-service
-            // поэтому тут именно "/orders/orders/my"
-            const orders = await apiJson("/orders/orders/me", {}, token);
-
-            const results = [];
-
-            // 2) Для каждого заказа подтягиваем кухонный статус
-            for (const order of (orders || []).slice(0, 20)) {
-                const id = order.order_id;
-
-                let kitchen = null;
-                try {
-                    kitchen = await fetchKitchenStatus(id);
-                } catch (_) {
-                    kitchen = null;
-                }
-
-                results.push({
-                    order_id: id,
-                    paid_status: order.status, // PAID — как статус оплаты
-                    total_price: order.total_price,
-                    channel: order.channel,
-                    items: order.items || [],
-                    kitchen_status: kitchen?.status || null,
-                    started_at: kitchen?.started_at || null,
-                    completed_at: kitchen?.completed_at || null,
-                });
-            }
+            // История заказов вместе со статусом кухни — одним запросом к order-service
+            // (order-service держит проекцию, обновляемую событиями kitchen.*)
+            // /api/orders/ -> order-service, поэтому "/orders/orders/me/summary"
+            const orders = await apiJson("/orders/orders/me/summary?limit=20", {}, token);
+
+            const results = (orders || []).map((order) => ({
+                order_id: order.order_id,
+                paid_status: order.status, // PAID — как статус оплаты
+                total_price: order.total_price,
+                channel: order.channel,
+                items: order.items || [],
+                kitchen_status: order.kitchen_status || null,
+                started_at: order.started_at || null,
+                completed_at: order.completed_at || null,
+            }));
 
             setMyOrders(results);
         } catch (e) {
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from app.core.settings import settings
-from app.db.session import engine, ping_db
+from app.db.session import engine, ping_db, run_db
+from app.core.loop_lag import monitor_loop_lag
 
 import asyncio
 import logging
+from sqlalchemy import insert
 from sqlalchemy.orm import sessionmaker, Session
 from app.messaging.consumer import RabbitConsumer
 
@@ -20,6 +22,10 @@ consumer = RabbitConsumer(
     amqp_url=settings.rabbitmq_url,
     queue_name="analytics.order.created",
     routing_key="order.created",
+    prefetch=settings.consumer_prefetch,
+    concurrency=settings.consumer_concurrency,
+    max_attempts=settings.consumer_max_attempts,
+    retry_base_delay=settings.consumer_retry_base_delay,
 )
 
 
@@ -28,7 +34,15 @@ SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 app = FastAPI(title=settings.service_name)
 
 async def handle(payload: dict):
-    
+    await run_db(store_event, payload)
+
+
+async def handle_batch(payloads: list[dict]):
+    await run_db(store_batch, payloads)
+
+
+def store_event(payload: dict):
+    # синхронная часть: выполняется в db_executor, а не на event loop
     order_id = payload.get("order_id")
     event_type = payload.get("event_type", "OrderCreated")
 
@@ -51,17 +65,68 @@ async def handle(payload: dict):
         db.close()
 
 
+def store_batch(payloads: list[dict]):
+    # одна транзакция и один multi-row INSERT на всю пачку
+    db: Session = SessionLocal()
+    try:
+        db.execute(
+            insert(AnalyticsEvent),
+            [
+                {
+                    "event_type": p.get("event_type", "OrderCreated"),
+                    "entity_id": str(p.get("order_id")),
+                    "source": "rabbitmq",
+                    "payload": p,
+                }
+                for p in payloads
+            ],
+        )
+        db.commit()
+        logger.info("ANALYTICS stored batch events=%s", len(payloads))
+    except Exception:
+        db.rollback()
+        logger.exception("ANALYTICS failed to store batch of %s events", len(payloads))
+        raise
+    finally:
+        db.close()
+
+
 @app.on_event("startup")
 async def on_startup():
+    app.state.loop_lag = asyncio.create_task(monitor_loop_lag(settings.service_name))
     Base.metadata.create_all(bind=engine)
 
     # Проверяем, что БД доступна (упадёт сразу, если DATABASE_URL неверный)
     ping_db()
 
     logger.info("ANALYTICS consumer starting...")
-    asyncio.create_task(consumer.connect_and_consume(handle))
+    if settings.consumer_batch_mode:
+        asyncio.create_task(
+            consumer.connect_and_consume_batches(
+                handle_batch,
+                batch_size=settings.consumer_batch_size,
+                batch_timeout=settings.consumer_batch_timeout_ms / 1000,
+            )
+        )
+    else:
+        asyncio.create_task(consumer.connect_and_consume(handle))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # дожидаемся сообщений, которые уже в обработке
+    await consumer.close()
+    app.state.loop_lag.cancel()
 
 
 @app.get("/health")
 def health():
     return {"status": "ok", "service": settings.service_name}
+
+
+from fastapi import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,24 @@
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.core.availability import AvailabilityIndex
+from app.schemas.inventory import AvailabilityOut
+
+router = APIRouter(tags=["availability"])
+
+# индекс в памяти: обновляется при каждом движении склада и по menu.changed
+availability = AvailabilityIndex()
+
+
+@router.get("/availability", response_model=list[AvailabilityOut])
+def get_availability(menu_item_ids: list[UUID] | None = Query(default=None, max_length=500)):
+    # позиции без рецепта складом не ограничены и в ответ не попадают
+    if not availability.ready:
+        raise HTTPException(status_code=503, detail="Availability is not loaded yet")
+
+    portions = availability.snapshot(menu_item_ids)
+    return [
+        {"menu_item_id": menu_item_id, "portions": count, "available": count > 0}
+        for menu_item_id, count in portions.items()
+    ]
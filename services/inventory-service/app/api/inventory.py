@@ -1,9 +1,17 @@
+from datetime import date, datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import select
+from sqlalchemy.exc import DataError
 from sqlalchemy.orm import Session
 
+from app.api.availability import availability
+from app.core.deduction import add_stock_bulk
+from app.core.low_stock import LowStockSet, stock_crossing
+from app.core.receipt_csv import MAX_AMOUNT, ReceiptCsv
+from app.core.movements import record_movements, stock_as_of, usage
 from app.db.session import get_db
 from app.models.ingredient import Ingredient
 from app.models.stock_item import StockItem
@@ -12,11 +20,69 @@ from app.schemas.inventory import (
     IngredientOut,
     StockItemOut,
     StockAddRequest,
+    StockBulkRequest,
     StockSetRequest,
+    StockAsOfOut,
+    UsageOut,
+    LowStockOut,
 )
 
 router = APIRouter(tags=["inventory"])
 
+# ингредиенты ниже reorder_threshold: обновляется при каждом движении склада
+low_stock = LowStockSet()
+
+
+def publish_crossing(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    row,
+    before: int,
+    threshold_before: int,
+) -> None:
+    # stock.low / stock.restored — только если остаток пересёк порог; публикуем после ответа
+    low_stock.apply(row.ingredient_id, row.quantity, row.reorder_threshold)
+    event = stock_crossing(row.ingredient_id, before, row.quantity, row.reorder_threshold, threshold_before)
+    if event:
+        background_tasks.add_task(request.app.state.publisher.publish, *event)
+
+
+def receive_stock(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session,
+    amounts: dict[UUID, int],
+) -> list[dict]:
+    # приход — одна транзакция на всю накладную: либо все позиции, либо ни одной
+    too_big = sorted(str(ing_id) for ing_id, amount in amounts.items() if amount > MAX_AMOUNT)
+    if too_big:
+        # повторы одного ингредиента в накладной суммируются — проверяем уже итог
+        raise HTTPException(
+            status_code=400,
+            detail=f"Total amount per ingredient is limited to {MAX_AMOUNT}: {', '.join(too_big)}",
+        )
+    try:
+        rows = add_stock_bulk(db, amounts)
+    except DataError:
+        # quantity + amount не влез в INTEGER stock_items.quantity
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Stock quantity would exceed the storage limit")
+    missing = amounts.keys() - {r.ingredient_id for r in rows}
+    if missing:
+        db.rollback()
+        if len(amounts) == 1:
+            raise HTTPException(status_code=404, detail="Ingredient not found in stock")
+        raise HTTPException(
+            status_code=404,
+            detail=f"Ingredients not found in stock: {', '.join(sorted(str(i) for i in missing))}",
+        )
+    db.commit()
+
+    availability.update_stock({r.ingredient_id: r.quantity for r in rows})
+    for r in rows:
+        publish_crossing(request, background_tasks, r, r.quantity - amounts[r.ingredient_id], r.reorder_threshold)
+    return [dict(r._mapping) for r in rows]
+
 
 @router.post("/ingredients", response_model=IngredientOut, status_code=201)
 def create_ingredient(payload: IngredientCreate, db: Session = Depends(get_db)):
@@ -35,6 +101,7 @@ def create_ingredient(payload: IngredientCreate, db: Session = Depends(get_db)):
 
     db.commit()
     db.refresh(ing)
+    availability.update_stock({ing.ingredient_id: 0})
     return ing
 
 
@@ -50,26 +117,112 @@ def list_stock(db: Session = Depends(get_db)):
     return rows
 
 
-@router.post("/stock/{ingredient_id}/add", response_model=StockItemOut)
-def add_stock(ingredient_id: UUID, payload: StockAddRequest, db: Session = Depends(get_db)):
-    row = db.scalar(select(StockItem).where(StockItem.ingredient_id == ingredient_id))
-    if not row:
-        raise HTTPException(status_code=404, detail="Ingredient not found in stock")
+@router.get("/stock/low", response_model=list[LowStockOut])
+def list_low_stock():
+    # из памяти, без запроса к БД; сначала самые глубоко провалившиеся
+    return low_stock.snapshot()
 
-    row.quantity += payload.amount
-    db.commit()
-    db.refresh(row)
-    return row
+
+@router.post("/stock/{ingredient_id}/add", response_model=StockItemOut)
+def add_stock(
+    ingredient_id: UUID,
+    payload: StockAddRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    # атомарный quantity = quantity + amount, как и у пакетного прихода
+    return receive_stock(request, background_tasks, db, {ingredient_id: payload.amount})[0]
+
+
+@router.post("/stock:bulk", response_model=list[StockItemOut])
+def add_stock_bulk_items(
+    payload: StockBulkRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    amounts: dict[UUID, int] = {}
+    for item in payload.items:
+        amounts[item.ingredient_id] = amounts.get(item.ingredient_id, 0) + item.amount
+    return receive_stock(request, background_tasks, db, amounts)
+
+
+@router.post("/stock:import", response_model=list[StockItemOut])
+async def import_stock_csv(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    # тело — text/csv: "ingredient_id,amount" или "name,amount", читается потоком
+    receipt = await ReceiptCsv().read(request.stream())
+
+    def apply() -> list[dict]:
+        amounts = dict(receipt.by_id)
+        if receipt.by_name:
+            found = dict(
+                db.execute(
+                    select(Ingredient.name, Ingredient.ingredient_id)
+                    .where(Ingredient.name.in_(list(receipt.by_name)))
+                ).all()
+            )
+            unknown = receipt.by_name.keys() - found.keys()
+            if unknown:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Unknown ingredients: {', '.join(sorted(unknown))}",
+                )
+            for name, amount in receipt.by_name.items():
+                amounts[found[name]] = amounts.get(found[name], 0) + amount
+        return receive_stock(request, background_tasks, db, amounts)
+
+    # синхронная сессия — в пул потоков, чтобы не держать event loop
+    return await run_in_threadpool(apply)
 
 
 @router.post("/stock/{ingredient_id}/set", response_model=StockItemOut)
-def set_stock(ingredient_id: UUID, payload: StockSetRequest, db: Session = Depends(get_db)):
-    row = db.scalar(select(StockItem).where(StockItem.ingredient_id == ingredient_id))
+def set_stock(
+    ingredient_id: UUID,
+    payload: StockSetRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    row = db.scalar(select(StockItem).where(StockItem.ingredient_id == ingredient_id).with_for_update())
     if not row:
         raise HTTPException(status_code=404, detail="Ingredient not found in stock")
 
+    if payload.quantity != row.quantity:
+        # ручная правка тоже попадает в журнал, иначе остаток на дату не восстановить
+        record_movements(
+            db,
+            [{"ingredient_id": ingredient_id, "quantity": payload.quantity - row.quantity, "movement_type": "ADJUST"}],
+        )
+    before, threshold_before = row.quantity, row.reorder_threshold
     row.quantity = payload.quantity
     row.reorder_threshold = payload.reorder_threshold
     db.commit()
     db.refresh(row)
+    availability.update_stock({row.ingredient_id: row.quantity})
+    publish_crossing(request, background_tasks, row, before, threshold_before)
     return row
+
+
+@router.get("/stock/as-of", response_model=list[StockAsOfOut])
+def get_stock_as_of(
+    at: datetime,
+    ingredient_ids: list[UUID] | None = Query(default=None, max_length=500),
+    db: Session = Depends(get_db),
+):
+    stock = stock_as_of(db, at, ingredient_ids)
+    return [{"ingredient_id": ing_id, "quantity": quantity, "at": at} for ing_id, quantity in stock.items()]
+
+
+@router.get("/usage", response_model=list[UsageOut])
+def get_usage(date_from: date, date_to: date, db: Session = Depends(get_db)):
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return [
+        {"ingredient_id": ing_id, "qty_in": qty_in, "qty_out": qty_out, "net": net}
+        for ing_id, qty_in, qty_out, net in usage(db, date_from, date_to)
+    ]
@@ -0,0 +1,104 @@
+import threading
+from uuid import UUID
+
+
+class AvailabilityIndex:
+    """Сколько порций каждой позиции меню можно приготовить из текущего склада.
+
+    portions = min(stock[i] // recipe[i]) по ингредиентам рецепта. Держим в памяти
+    рецепты, остатки и обратный индекс ингредиент -> позиции, поэтому движение
+    склада пересчитывает только позиции, где этот ингредиент участвует.
+    Обновляется из консьюмера и HTTP-ручек (разные потоки), отсюда lock.
+    """
+
+    def __init__(self):
+        self.recipes: dict[UUID, dict[UUID, int]] = {}
+        self.stock: dict[UUID, int] = {}
+        self.portions: dict[UUID, int] = {}
+        self.used_in: dict[UUID, set[UUID]] = {}
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def load(self, recipes: dict[UUID, dict[UUID, int]], stock: dict[UUID, int]) -> None:
+        with self._lock:
+            self.recipes = {}
+            self.used_in = {}
+            self.stock = dict(stock)
+            self.portions = {}
+            for menu_item_id, recipe in recipes.items():
+                self._set_recipe(menu_item_id, recipe)
+            self.ready = True
+
+    def set_stock(self, stock: dict[UUID, int]) -> None:
+        # полная сверка со stock_items (периодически): правки других экземпляров сервиса
+        with self._lock:
+            changed = {i for i in stock.keys() | self.stock.keys() if stock.get(i) != self.stock.get(i)}
+            self.stock = dict(stock)
+            self._recompute(changed)
+
+    def update_stock(self, changes: dict[UUID, int]) -> None:
+        # ingredient_id -> новый остаток после commit
+        if not changes:
+            return
+        with self._lock:
+            self.stock.update(changes)
+            self._recompute(changes.keys())
+
+    def update_recipes(self, recipes: dict[UUID, dict[UUID, int] | None]) -> None:
+        # None — позиция удалена или выключена
+        with self._lock:
+            for menu_item_id, recipe in recipes.items():
+                self._drop_recipe(menu_item_id)
+                if recipe is not None:
+                    self._set_recipe(menu_item_id, recipe)
+
+    def snapshot(self, menu_item_ids: list[UUID] | None = None) -> dict[UUID, int]:
+        with self._lock:
+            if menu_item_ids is None:
+                return dict(self.portions)
+            return {i: self.portions[i] for i in menu_item_ids if i in self.portions}
+
+    def _set_recipe(self, menu_item_id: UUID, recipe: dict[UUID, int]) -> None:
+        if not recipe:
+            # позиции без рецепта склад не ограничивает — в индекс не попадают
+            return
+        self.recipes[menu_item_id] = recipe
+        for ing_id in recipe:
+            self.used_in.setdefault(ing_id, set()).add(menu_item_id)
+        self.portions[menu_item_id] = self._portions(recipe)
+
+    def _drop_recipe(self, menu_item_id: UUID) -> None:
+        recipe = self.recipes.pop(menu_item_id, None) or {}
+        for ing_id in recipe:
+            users = self.used_in.get(ing_id)
+            if users:
+                users.discard(menu_item_id)
+                if not users:
+                    del self.used_in[ing_id]
+        self.portions.pop(menu_item_id, None)
+
+    def _recompute(self, ingredient_ids) -> None:
+        affected = set()
+        for ing_id in ingredient_ids:
+            affected |= self.used_in.get(ing_id, set())
+        for menu_item_id in affected:
+            self.portions[menu_item_id] = self._portions(self.recipes[menu_item_id])
+
+    def _portions(self, recipe: dict[UUID, int]) -> int:
+        return min(max(self.stock.get(ing_id, 0), 0) // qty for ing_id, qty in recipe.items())
+
+
+def recipes_from_menu(items: list[dict]) -> dict[UUID, dict[UUID, int] | None]:
+    # ответ menu-service /items:batch -> menu_item_id -> {ingredient_id: quantity}
+    recipes: dict[UUID, dict[UUID, int] | None] = {}
+    for item in items:
+        menu_item_id = UUID(str(item["menu_item_id"]))
+        if not item.get("is_active", True):
+            recipes[menu_item_id] = None
+            continue
+        recipe: dict[UUID, int] = {}
+        for r in item.get("recipe", []):
+            ing_id = UUID(str(r["ingredient_id"]))
+            recipe[ing_id] = recipe.get(ing_id, 0) + int(r["quantity"])
+        recipes[menu_item_id] = recipe
+    return recipes
@@ -0,0 +1,212 @@
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from sqlalchemy import Integer, column, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Session
+
+from app.core.low_stock import stock_crossing
+from app.core.movements import record_movements
+from app.models.stock_item import StockItem
+
+
+@dataclass
+class DeductionResult:
+    # ingredient_id -> остаток после списания
+    deducted: dict[UUID, int] = field(default_factory=dict)
+    # ingredient_id -> сколько требовалось, но списать не вышло (нет строки или не хватает)
+    skipped: dict[UUID, int] = field(default_factory=dict)
+    # ingredient_id -> сколько было на складе в момент отказа (None — ингредиента нет в stock_items)
+    available: dict[UUID, int | None] = field(default_factory=dict)
+    # ingredient_id -> reorder_threshold списанных строк (для stock.low / stock.restored)
+    thresholds: dict[UUID, int] = field(default_factory=dict)
+
+
+def aggregate_needs(ingredients: list[dict]) -> dict[UUID, int]:
+    # одинаковый ингредиент в событии может встретиться дважды — в VALUES он должен быть один раз
+    needs: dict[UUID, int] = {}
+    for ing in ingredients:
+        ing_id = UUID(str(ing["ingredient_id"]))
+        needs[ing_id] = needs.get(ing_id, 0) + int(ing["quantity"])
+    return needs
+
+
+def deduct_stock(db: Session, order_id: UUID, needs: dict[UUID, int]) -> DeductionResult:
+    """Списывает все ингредиенты заказа одним UPDATE ... FROM (VALUES ...) RETURNING.
+
+    Строки stock_items сначала блокируются в порядке ingredient_id (CTE с FOR UPDATE),
+    поэтому два заказа с общими ингредиентами не ловят deadlock. Условие quantity >= need
+    проверяется уже на заблокированной строке: конкурентные списания не теряются
+    и склад не уходит в минус. Движения вставляются одним multi-row INSERT.
+    """
+    result = DeductionResult()
+    if not needs:
+        return result
+
+    need = values(
+        column("ingredient_id", PG_UUID(as_uuid=True)),
+        column("qty", Integer),
+        name="need",
+    ).data(sorted(needs.items()))
+
+    locked = (
+        select(StockItem.ingredient_id)
+        .where(StockItem.ingredient_id.in_(list(needs)))
+        .order_by(StockItem.ingredient_id)
+        .with_for_update()
+        .cte("locked")
+    )
+
+    rows = db.execute(
+        update(StockItem)
+        .where(
+            StockItem.ingredient_id == need.c.ingredient_id,
+            StockItem.ingredient_id == locked.c.ingredient_id,
+            StockItem.quantity >= need.c.qty,
+        )
+        .values(quantity=StockItem.quantity - need.c.qty)
+        .returning(StockItem.ingredient_id, StockItem.quantity, StockItem.reorder_threshold)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    result.deducted = {ing_id: quantity for ing_id, quantity, _ in rows}
+    result.thresholds = {ing_id: threshold for ing_id, _, threshold in rows}
+    result.skipped = {ing_id: qty for ing_id, qty in needs.items() if ing_id not in result.deducted}
+
+    if result.skipped:
+        # редкий путь: дочитываем остатки только ради понятного лога
+        have = dict(
+            db.execute(
+                select(StockItem.ingredient_id, StockItem.quantity)
+                .where(StockItem.ingredient_id.in_(list(result.skipped)))
+            ).all()
+        )
+        result.available = {ing_id: have.get(ing_id) for ing_id in result.skipped}
+
+    insert_movements(db, [(order_id, needs, result)])
+    return result
+
+
+def deduct_stock_batch(db: Session, orders: list[tuple[UUID, dict[UUID, int]]]) -> list[DeductionResult]:
+    """Эскроу для горячих строк: списание целой пачки заказов за одну блокировку строки.
+
+    Утром почти каждый заказ трогает одни и те же зёрна/молоко/стаканы, и поштучное
+    списание упирается в очередь на блокировку одной строки stock_items. Здесь строки
+    всех ингредиентов пачки блокируются один раз (в порядке ingredient_id), остаток
+    раздаётся заказам по очереди в памяти — заказ получает ингредиент целиком или
+    не получает, склад не уходит в минус, — и итог пишется одним UPDATE.
+    """
+    results = [DeductionResult() for _ in orders]
+    all_ids = sorted({ing_id for _, needs in orders for ing_id in needs})
+    if not all_ids:
+        return results
+
+    locked = db.execute(
+        select(StockItem.ingredient_id, StockItem.quantity, StockItem.reorder_threshold)
+        .where(StockItem.ingredient_id.in_(all_ids))
+        .order_by(StockItem.ingredient_id)
+        .with_for_update()
+    ).all()
+    have: dict[UUID, int] = {ing_id: quantity for ing_id, quantity, _ in locked}
+    thresholds: dict[UUID, int] = {ing_id: threshold for ing_id, _, threshold in locked}
+
+    totals: dict[UUID, int] = {}
+    for (_, needs), result in zip(orders, results):
+        for ing_id, qty in needs.items():
+            left = have.get(ing_id)
+            if left is None or left < qty:
+                result.skipped[ing_id] = qty
+                result.available[ing_id] = left
+                continue
+            have[ing_id] = left - qty
+            totals[ing_id] = totals.get(ing_id, 0) + qty
+            result.deducted[ing_id] = have[ing_id]
+            result.thresholds[ing_id] = thresholds[ing_id]
+
+    if totals:
+        total = values(
+            column("ingredient_id", PG_UUID(as_uuid=True)),
+            column("qty", Integer),
+            name="total",
+        ).data(sorted(totals.items()))
+        db.execute(
+            update(StockItem)
+            .where(StockItem.ingredient_id == total.c.ingredient_id)
+            .values(quantity=StockItem.quantity - total.c.qty)
+            .execution_options(synchronize_session=False)
+        )
+
+    insert_movements(db, [(order_id, needs, result) for (order_id, needs), result in zip(orders, results)])
+    return results
+
+
+def add_stock_bulk(db: Session, amounts: dict[UUID, int]) -> list:
+    """Приход сразу по многим ингредиентам: quantity = quantity + x одним UPDATE ... RETURNING.
+
+    Без чтения в Python, поэтому конкурентное списание не теряется; строки блокируются
+    в том же порядке ingredient_id, что и при списании. Движения IN — одним INSERT.
+    Возвращает (ingredient_id, quantity, reorder_threshold, updated_at) обновлённых строк.
+    """
+    if not amounts:
+        return []
+
+    amount = values(
+        column("ingredient_id", PG_UUID(as_uuid=True)),
+        column("qty", Integer),
+        name="amount",
+    ).data(sorted(amounts.items()))
+
+    locked = (
+        select(StockItem.ingredient_id)
+        .where(StockItem.ingredient_id.in_(list(amounts)))
+        .order_by(StockItem.ingredient_id)
+        .with_for_update()
+        .cte("locked")
+    )
+
+    rows = db.execute(
+        update(StockItem)
+        .where(
+            StockItem.ingredient_id == amount.c.ingredient_id,
+            StockItem.ingredient_id == locked.c.ingredient_id,
+        )
+        .values(quantity=StockItem.quantity + amount.c.qty)
+        .returning(StockItem.ingredient_id, StockItem.quantity, StockItem.reorder_threshold, StockItem.updated_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    record_movements(
+        db,
+        [
+            {"ingredient_id": ing_id, "quantity": amounts[ing_id], "movement_type": "IN"}
+            for ing_id, *_ in rows
+        ],
+    )
+    return rows
+
+
+def threshold_events(needs: dict[UUID, int], result: DeductionResult) -> list[tuple[str, dict]]:
+    # остаток до списания = после + списанное: переход через порог определяем без лишних запросов
+    events = []
+    for ing_id, after in result.deducted.items():
+        event = stock_crossing(ing_id, after + needs[ing_id], after, result.thresholds[ing_id])
+        if event:
+            events.append(event)
+    return events
+
+
+def insert_movements(db: Session, orders: list[tuple[UUID, dict[UUID, int], DeductionResult]]) -> None:
+    # движения по всем списанным ингредиентам — одним multi-row INSERT (+ дневные итоги)
+    record_movements(
+        db,
+        [
+            {
+                "ingredient_id": ing_id,
+                "quantity": needs[ing_id],
+                "movement_type": "OUT",
+                "order_id": order_id,
+            }
+            for order_id, needs, result in orders
+            for ing_id in result.deducted
+        ],
+    )
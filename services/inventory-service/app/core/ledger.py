@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.processed_message import ProcessedMessage
+
+
+class ProcessedLedger:
+    """Журнал обработанных событий: LRU в памяти перед таблицей processed_messages.
+
+    Строка ledger пишется в той же транзакции, что и списание, поэтому повторная
+    доставка после commit (но до ack) отсекается уникальным ключом. Недавние ключи
+    держим в памяти, чтобы типичный повтор вообще не ходил в БД.
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.keys: OrderedDict[tuple[UUID, str], None] = OrderedDict()
+
+    def seen(self, order_id: UUID, event_type: str) -> bool:
+        key = (order_id, event_type)
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return True
+        return False
+
+    def remember(self, order_id: UUID, event_type: str) -> None:
+        self.keys[(order_id, event_type)] = None
+        self.keys.move_to_end((order_id, event_type))
+        while len(self.keys) > self.max_items:
+            self.keys.popitem(last=False)
+
+    @staticmethod
+    def claim(db: Session, order_id: UUID, event_type: str) -> bool:
+        # True — событие новое и теперь закреплено за текущей транзакцией;
+        # конкурентный дубль ждёт на уникальном ключе и после нашего commit получает False
+        claimed = db.scalar(
+            insert(ProcessedMessage)
+            .values(order_id=order_id, event_type=event_type)
+            .on_conflict_do_nothing(index_elements=["order_id", "event_type"])
+            .returning(ProcessedMessage.order_id)
+        )
+        return claimed is not None
+
+    @staticmethod
+    def claim_many(db: Session, keys: list[tuple[UUID, str]]) -> set[tuple[UUID, str]]:
+        # пакетный вариант claim: один multi-row INSERT, возвращаются только новые ключи
+        if not keys:
+            return set()
+        rows = db.execute(
+            insert(ProcessedMessage)
+            .values([{"order_id": order_id, "event_type": event_type} for order_id, event_type in keys])
+            .on_conflict_do_nothing(index_elements=["order_id", "event_type"])
+            .returning(ProcessedMessage.order_id, ProcessedMessage.event_type)
+        ).all()
+        return {(order_id, event_type) for order_id, event_type in rows}
+
+    @staticmethod
+    def prune(db: Session, retention: timedelta) -> int:
+        # ключи старше горизонта повторных доставок (ретраи + ручной replay из .dead) не нужны
+        result = db.execute(
+            delete(ProcessedMessage).where(ProcessedMessage.processed_at < func.now() - retention)
+        )
+        return result.rowcount
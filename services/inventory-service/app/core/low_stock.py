@@ -0,0 +1,66 @@
+import threading
+from uuid import UUID
+
+
+def is_low(quantity: int, reorder_threshold: int) -> bool:
+    # порог 0 — оповещения для ингредиента выключены
+    return reorder_threshold > 0 and quantity <= reorder_threshold
+
+
+def stock_crossing(
+    ingredient_id: UUID,
+    before: int,
+    after: int,
+    reorder_threshold: int,
+    threshold_before: int | None = None,
+) -> tuple[str, dict] | None:
+    """Событие stock.low / stock.restored, если остаток пересёк порог, иначе None.
+
+    before/after берутся под блокировкой строки в той же транзакции, поэтому
+    переход видит ровно одна транзакция — несколько экземпляров сервиса не дублируют события.
+    """
+    was_low = is_low(before, reorder_threshold if threshold_before is None else threshold_before)
+    now_low = is_low(after, reorder_threshold)
+    if was_low == now_low:
+        return None
+    return (
+        "stock.low" if now_low else "stock.restored",
+        {
+            "event_type": "StockLow" if now_low else "StockRestored",
+            "ingredient_id": str(ingredient_id),
+            "quantity": after,
+            "reorder_threshold": reorder_threshold,
+        },
+    )
+
+
+class LowStockSet:
+    """Ингредиенты, которые сейчас ниже порога: отдаём из памяти вместо опроса /stock."""
+
+    def __init__(self):
+        self.items: dict[UUID, dict] = {}
+        self._lock = threading.Lock()
+
+    def load(self, rows: list[tuple[UUID, int, int]]) -> None:
+        # полная сверка с stock_items: (ingredient_id, quantity, reorder_threshold)
+        with self._lock:
+            self.items = {
+                ing_id: {"ingredient_id": ing_id, "quantity": quantity, "reorder_threshold": threshold}
+                for ing_id, quantity, threshold in rows
+                if is_low(quantity, threshold)
+            }
+
+    def apply(self, ingredient_id: UUID, quantity: int, reorder_threshold: int) -> None:
+        with self._lock:
+            if is_low(quantity, reorder_threshold):
+                self.items[ingredient_id] = {
+                    "ingredient_id": ingredient_id,
+                    "quantity": quantity,
+                    "reorder_threshold": reorder_threshold,
+                }
+            else:
+                self.items.pop(ingredient_id, None)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return sorted(self.items.values(), key=lambda i: i["quantity"] - i["reorder_threshold"])
@@ -0,0 +1,163 @@
+import logging
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import case, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.session import engine
+from app.models.inventory_daily_rollup import InventoryDailyRollup
+from app.models.inventory_movement import InventoryMovement
+from app.models.stock_item import StockItem
+
+logger = logging.getLogger("coffee")
+
+# изменение остатка со знаком для строки inventory_movements
+MOVEMENT_DELTA = case(
+    (InventoryMovement.movement_type == "OUT", -InventoryMovement.quantity),
+    else_=InventoryMovement.quantity,
+)
+
+
+def movement_delta(movement_type: str, quantity: int) -> int:
+    return -quantity if movement_type == "OUT" else quantity
+
+
+def record_movements(db: Session, rows: list[dict]) -> None:
+    """Пишет движения одним multi-row INSERT и тут же досчитывает дневные итоги.
+
+    Итоги за день (inventory_daily_rollups) обновляются upsert'ом в той же транзакции:
+    отчёты и реконструкция остатка читают их, а не весь журнал. День берём из
+    current_date, а created_at движения — из now(): оба считаются от начала транзакции.
+    """
+    if not rows:
+        return
+    db.execute(insert(InventoryMovement), rows)
+
+    totals: dict[UUID, dict[str, int]] = {}
+    for row in rows:
+        t = totals.setdefault(row["ingredient_id"], {"qty_in": 0, "qty_out": 0, "net": 0, "movements": 0})
+        if row["movement_type"] == "OUT":
+            t["qty_out"] += row["quantity"]
+        elif row["movement_type"] == "IN":
+            t["qty_in"] += row["quantity"]
+        t["net"] += movement_delta(row["movement_type"], row["quantity"])
+        t["movements"] += 1
+
+    # сортировка — тот же порядок блокировок строк итогов, что и у stock_items
+    stmt = pg_insert(InventoryDailyRollup).values(
+        [{"day": func.current_date(), "ingredient_id": ing_id, **t} for ing_id, t in sorted(totals.items())]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[InventoryDailyRollup.day, InventoryDailyRollup.ingredient_id],
+            set_={
+                "qty_in": InventoryDailyRollup.qty_in + stmt.excluded.qty_in,
+                "qty_out": InventoryDailyRollup.qty_out + stmt.excluded.qty_out,
+                "net": InventoryDailyRollup.net + stmt.excluded.net,
+                "movements": InventoryDailyRollup.movements + stmt.excluded.movements,
+            },
+        )
+    )
+
+
+def stock_as_of(db: Session, at: datetime, ingredient_ids: list[UUID] | None = None) -> dict[UUID, int]:
+    """Остаток на момент at: текущий снимок stock_items минус всё, что случилось после.
+
+    Целые дни после at берутся из дневных итогов, и только хвост дня at — из самого
+    журнала (одна партиция, индекс ingredient_id + created_at). Всё читается одним
+    запросом: снимок, итоги и журнал видят одно и то же состояние даже в READ COMMITTED.
+    """
+    # created_at и day хранятся без зоны (время БД, UTC) — aware-время приводим к нему
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    next_day = at.date() + timedelta(days=1)
+
+    later_days = (
+        select(InventoryDailyRollup.ingredient_id, func.sum(InventoryDailyRollup.net).label("delta"))
+        .where(InventoryDailyRollup.day >= next_day)
+        .group_by(InventoryDailyRollup.ingredient_id)
+    )
+    rest_of_day = (
+        select(InventoryMovement.ingredient_id, func.sum(MOVEMENT_DELTA).label("delta"))
+        .where(InventoryMovement.created_at > at, InventoryMovement.created_at < next_day)
+        .group_by(InventoryMovement.ingredient_id)
+    )
+    current = select(StockItem.ingredient_id, StockItem.quantity)
+    if ingredient_ids:
+        current = current.where(StockItem.ingredient_id.in_(ingredient_ids))
+        later_days = later_days.where(InventoryDailyRollup.ingredient_id.in_(ingredient_ids))
+        rest_of_day = rest_of_day.where(InventoryMovement.ingredient_id.in_(ingredient_ids))
+
+    later_days = later_days.subquery()
+    rest_of_day = rest_of_day.subquery()
+    stmt = (
+        current.add_columns(func.coalesce(later_days.c.delta, 0), func.coalesce(rest_of_day.c.delta, 0))
+        .outerjoin(later_days, later_days.c.ingredient_id == StockItem.ingredient_id)
+        .outerjoin(rest_of_day, rest_of_day.c.ingredient_id == StockItem.ingredient_id)
+    )
+    return {
+        ing_id: quantity - int(later) - int(rest)
+        for ing_id, quantity, later, rest in db.execute(stmt).all()
+    }
+
+
+def usage(db: Session, date_from: date, date_to: date) -> list[tuple[UUID, int, int, int]]:
+    # расход/приход за период — только по дневным итогам
+    return db.execute(
+        select(
+            InventoryDailyRollup.ingredient_id,
+            func.sum(InventoryDailyRollup.qty_in),
+            func.sum(InventoryDailyRollup.qty_out),
+            func.sum(InventoryDailyRollup.net),
+        )
+        .where(InventoryDailyRollup.day >= date_from, InventoryDailyRollup.day <= date_to)
+        .group_by(InventoryDailyRollup.ingredient_id)
+        .order_by(func.sum(InventoryDailyRollup.qty_out).desc())
+    ).all()
+
+
+def ensure_movement_order_id_nullable() -> None:
+    """Снимает NOT NULL с inventory_movements.order_id на уже существующей таблице.
+
+    create_all существующие таблицы не меняет, а у пополнений и ручных правок заказа нет.
+    DROP NOT NULL на уже nullable колонке ничего не делает; у партиционированной
+    таблицы изменение доходит до всех партиций.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE inventory_movements ALTER COLUMN order_id DROP NOT NULL"))
+
+
+def ensure_movement_partitions(months_ahead: int) -> None:
+    """Создаёт партиции inventory_movements на текущий и months_ahead следующих месяцев.
+
+    Старые месяцы отключаются дёшево: ALTER TABLE inventory_movements DETACH PARTITION ...
+    DEFAULT-партиция страхует вставку, если этот job не успел отработать.
+    """
+    with engine.begin() as conn:
+        partitioned = conn.scalar(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('inventory_movements'))"
+            )
+        )
+        if not partitioned:
+            # таблица создана до партиционирования — её нужно перенести вручную
+            logger.warning("INVENTORY inventory_movements is not partitioned, skipping partition maintenance")
+            return
+
+        conn.execute(
+            text("CREATE TABLE IF NOT EXISTS inventory_movements_default PARTITION OF inventory_movements DEFAULT")
+        )
+        # месяц считаем по часам БД: created_at ставит её now(), а не часы хоста приложения
+        start = conn.scalar(text("SELECT current_date")).replace(day=1)
+        for _ in range(months_ahead + 1):
+            end = (start + timedelta(days=32)).replace(day=1)
+            conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS inventory_movements_{start:%Y_%m} "
+                    f"PARTITION OF inventory_movements FOR VALUES FROM ('{start}') TO ('{end}')"
+                )
+            )
+            start = end
@@ -0,0 +1,95 @@
+import codecs
+import csv
+from typing import AsyncIterator
+from uuid import UUID
+
+from fastapi import HTTPException
+
+MAX_ROWS = 5000
+# итог по одному ингредиенту за накладную — тот же потолок, что у одиночного прихода
+MAX_AMOUNT = 1_000_000
+# строка без перевода строки не должна копиться в памяти бесконечно
+MAX_LINE_CHARS = 4096
+
+
+def _decode(decoder: codecs.IncrementalDecoder, data: bytes, final: bool = False) -> str:
+    try:
+        return decoder.decode(data, final=final)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+
+
+class ReceiptCsv:
+    """Накладная поставщика в CSV: колонка ingredient_id или name, плюс amount.
+
+    Читаем тело запроса потоком построчно и сразу суммируем по ингредиенту,
+    так что в памяти лежит только итог, а не весь файл.
+    """
+
+    def __init__(self):
+        self.by_id: dict[UUID, int] = {}
+        self.by_name: dict[str, int] = {}
+        self.rows = 0
+        self._columns: list[str] | None = None
+
+    async def read(self, chunks: AsyncIterator[bytes]) -> "ReceiptCsv":
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        tail = ""
+        line_no = 0
+        async for chunk in chunks:
+            tail += _decode(decoder, chunk)
+            *lines, tail = tail.split("\n")
+            for line in lines:
+                line_no += 1
+                self._feed(line, line_no)
+            if len(tail) > MAX_LINE_CHARS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"CSV line {line_no + 1} is longer than {MAX_LINE_CHARS} characters",
+                )
+        tail += _decode(decoder, b"", final=True)
+        if tail:
+            self._feed(tail, line_no + 1)
+
+        if self._columns is None or not self.rows:
+            raise HTTPException(status_code=400, detail="CSV has no rows")
+        return self
+
+    def _feed(self, line: str, line_no: int) -> None:
+        line = line.rstrip("\r")
+        if not line.strip():
+            return
+        values = next(csv.reader([line]))
+
+        if self._columns is None:
+            self._columns = [c.strip().lower() for c in values]
+            if "amount" not in self._columns or not {"ingredient_id", "name"} & set(self._columns):
+                raise HTTPException(
+                    status_code=400,
+                    detail="CSV header must contain amount and ingredient_id or name",
+                )
+            return
+
+        row = dict(zip(self._columns, (v.strip() for v in values)))
+        try:
+            amount = int(row.get("amount", ""))
+            if not 1 <= amount <= 1_000_000:
+                raise ValueError
+            key = UUID(row["ingredient_id"]) if row.get("ingredient_id") else row.get("name") or None
+            if key is None:
+                raise ValueError
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV row at line {line_no}")
+
+        self.rows += 1
+        if self.rows > MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"CSV is limited to {MAX_ROWS} rows")
+
+        target = self.by_id if isinstance(key, UUID) else self.by_name
+        total = target.get(key, 0) + amount
+        if total > MAX_AMOUNT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Total amount for {key} exceeds {MAX_AMOUNT} (line {line_no})",
+            )
+        target[key] = total
@@ -5,6 +5,37 @@ class Settings(BaseSettings):
     service_name: str = "inventory-service"
     database_url: str
     rabbitmq_url: str
+    menu_service_url: str
+
+    # рецепты для /availability берём из menu-service; остатки сверяем с БД раз в interval
+    menu_http_timeout: float = 5.0
+    availability_refresh_interval: float = 30.0
+    # полная перезагрузка рецептов — на случай потерянного menu.changed
+    availability_recipes_refresh_interval: float = 300.0
+
+    # inventory_movements партиционирована по месяцам: держим готовыми партиции на N месяцев вперёд
+    movement_partitions_ahead: int = 2
+
+    # RabbitMQ consumer
+    consumer_prefetch: int = 32
+    consumer_concurrency: int = 16
+    # упавшее сообщение ретраится с паузой base * 2^(n-1) сек, после max_attempts — в <queue>.dead;
+    # TTL зашит в аргументы очередей <queue>.retry.N: после изменения их нужно пересоздать
+    consumer_max_attempts: int = 5
+    consumer_retry_base_delay: float = 1.0
+    # эскроу для горячих строк: пачка заказов списывается за одну блокировку
+    # каждой строки stock_items; False — поштучное списание одним UPDATE на заказ
+    consumer_batch_mode: bool = True
+    consumer_batch_size: int = 200
+    consumer_batch_timeout_ms: int = 50
+    # потоки под синхронную работу консьюмера с БД (не больше пула соединений engine)
+    consumer_db_threads: int = 8
+
+    # сколько последних обработанных (order_id, event_type) помнить в памяти
+    processed_cache_max_items: int = 100_000
+    # сколько дней хранить processed_messages: должно перекрывать ретраи и replay из <queue>.dead,
+    # событие старше этого при повторной доставке спишет склад ещё раз
+    processed_retention_days: int = 14
 
     model_config = SettingsConfigDict(env_file=None, extra="ignore")
 
@@ -0,0 +1,33 @@
+from uuid import UUID
+import httpx
+
+from app.core.settings import settings
+
+
+class MenuClient:
+    def __init__(self):
+        self.base_url = settings.menu_service_url.rstrip("/")
+        self.client: httpx.AsyncClient | None = None
+
+    async def connect(self) -> None:
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=settings.menu_http_timeout)
+
+    async def close(self) -> None:
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def list_item_ids(self) -> list[str]:
+        r = await self.client.get("/items", params={"active_only": True})
+        r.raise_for_status()
+        return [str(item["menu_item_id"]) for item in r.json()]
+
+    async def get_items(self, menu_item_ids: list[UUID | str]) -> list[dict]:
+        # /items:batch отдаёт позиции вместе с рецептами, не больше 500 за запрос
+        ids = [str(i) for i in dict.fromkeys(menu_item_ids)]
+        items: list[dict] = []
+        for start in range(0, len(ids), 500):
+            r = await self.client.post("/items:batch", json={"menu_item_ids": ids[start:start + 500]})
+            r.raise_for_status()
+            items.extend(r.json())
+        return items
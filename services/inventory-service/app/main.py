@@ -1,15 +1,22 @@
 from fastapi import FastAPI
 from app.core.settings import settings
-from app.db.session import engine, ping_db
+from app.db.session import engine, ping_db, run_db
+from app.core.loop_lag import monitor_loop_lag
 
 from app.db.base import Base
 import asyncio
+from datetime import timedelta
 from app.messaging.consumer import RabbitConsumer
+from app.messaging.rabbit import RabbitPublisher
 
 from app.models import inventory_movement as _inventory_movement  # noqa: F401
 from app.models import ingredient as _ingredient  # noqa: F401
 from app.models import stock_item as _stock_item  # noqa: F401
-from app.api.inventory import router as inventory_router
+from app.models import processed_message as _processed_message  # noqa: F401
+from app.models import inventory_daily_rollup as _inventory_daily_rollup  # noqa: F401
+from app.api.inventory import router as inventory_router, low_stock
+from app.api.admin import router as admin_router
+from app.api.availability import router as availability_router, availability
 
 
 
@@ -19,8 +26,18 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.db.session import SessionLocal
+from app.core.availability import recipes_from_menu
+from app.core.movements import ensure_movement_order_id_nullable, ensure_movement_partitions
+from app.integrations.menu_client import MenuClient
 from app.models.stock_item import StockItem
-from app.models.inventory_movement import InventoryMovement
+from app.core.deduction import (
+    DeductionResult,
+    aggregate_needs,
+    deduct_stock,
+    deduct_stock_batch,
+    threshold_events,
+)
+from app.core.ledger import ProcessedLedger
 
 
 
@@ -30,11 +47,29 @@ app = FastAPI(title=settings.service_name)
 
 
 app.include_router(inventory_router)
+app.include_router(admin_router)
+app.include_router(availability_router)
 
 consumer = RabbitConsumer(
     amqp_url=settings.rabbitmq_url,
     queue_name="inventory.order.created",
     routing_key="order.created",
+    prefetch=settings.consumer_prefetch,
+    concurrency=settings.consumer_concurrency,
+    max_attempts=settings.consumer_max_attempts,
+    retry_base_delay=settings.consumer_retry_base_delay,
+)
+
+ledger = ProcessedLedger(max_items=settings.processed_cache_max_items)
+
+menu_client = MenuClient()
+
+# изменения рецептов: у каждого экземпляра своя временная очередь (свой индекс в памяти)
+menu_consumer = RabbitConsumer(
+    amqp_url=settings.rabbitmq_url,
+    queue_name="",
+    routing_key="menu.changed",
+    exclusive=True,
 )
 
 
@@ -44,59 +79,112 @@ logging.basicConfig(level=logging.INFO)
 
 async def handle(payload: dict):
     order_id = payload.get("order_id")
+    event_type = payload.get("event_type", "OrderCreated")
+    if order_id and ledger.seen(UUID(str(order_id)), event_type):
+        # повторная доставка уже обработанного события — даже в БД не ходим
+        logger.info("INVENTORY duplicate event=%s order_id=%s skipped", event_type, order_id)
+        return
+
+    recorded, stock_events = await run_db(process_order_created, payload)
+    if recorded:
+        ledger.remember(UUID(str(order_id)), event_type)
+    await publish_stock_events(stock_events)
+
+
+async def handle_batch(payloads: list[dict]):
+    fresh = []
+    for payload in payloads:
+        order_id = payload.get("order_id")
+        event_type = payload.get("event_type", "OrderCreated")
+        if order_id and ledger.seen(UUID(str(order_id)), event_type):
+            logger.info("INVENTORY duplicate event=%s order_id=%s skipped", event_type, order_id)
+            continue
+        fresh.append(payload)
+    if not fresh:
+        return
+
+    keys, stock_events = await run_db(process_order_batch, fresh)
+    for key in keys:
+        ledger.remember(*key)
+    await publish_stock_events(stock_events)
+
+
+async def publish_stock_events(stock_events: list[tuple[str, dict]]):
+    # публикуем после commit; сбой брокера не должен возвращать уже списанный заказ в retry
+    for routing_key, event in stock_events:
+        try:
+            await app.state.publisher.publish(routing_key, event)
+        except Exception:
+            logger.exception("INVENTORY failed to publish %s for ingredient_id=%s", routing_key, event["ingredient_id"])
+
+
+def parse_order_event(payload: dict) -> tuple[UUID, str, dict[UUID, int]] | None:
+    order_id = payload.get("order_id")
+    event_type = payload.get("event_type", "OrderCreated")
     ingredients = payload.get("ingredients", [])
 
     if not order_id:
         logger.warning("INVENTORY event without order_id: %s", payload)
-        return
+        return None
 
     if not ingredients:
         logger.info("INVENTORY no ingredients to deduct for order_id=%s", order_id)
-        return
+        return None
+
+    return UUID(str(order_id)), event_type, aggregate_needs(ingredients)
+
+
+def log_result(order_id: UUID, result: DeductionResult) -> None:
+    for ing_id, need_qty in result.skipped.items():
+        if result.available.get(ing_id) is None:
+            logger.warning("INVENTORY unknown ingredient_id=%s (order_id=%s)", ing_id, order_id)
+        else:
+            # MVP-решение: не списываем, чтобы не уходить в минус
+            logger.warning(
+                "INVENTORY insufficient stock ingredient_id=%s have=%s need=%s (order_id=%s)",
+                ing_id, result.available[ing_id], need_qty, order_id
+            )
+
+
+def after_commit(deductions: list[tuple[dict[UUID, int], DeductionResult]]) -> list[tuple[str, dict]]:
+    # заказы шли по очереди, поэтому у более позднего результата остаток свежее
+    remaining: dict[UUID, int] = {}
+    stock_events: list[tuple[str, dict]] = []
+    for needs, result in deductions:
+        remaining.update(result.deducted)
+        for ing_id, quantity in result.deducted.items():
+            low_stock.apply(ing_id, quantity, result.thresholds[ing_id])
+        stock_events.extend(threshold_events(needs, result))
+    availability.update_stock(remaining)
+    return stock_events
+
+
+def process_order_created(payload: dict) -> tuple[bool, list[tuple[str, dict]]]:
+    # синхронная часть: выполняется в db_executor, а не на event loop;
+    # True — событие зафиксировано в processed_messages (сейчас или раньше),
+    # плюс события stock.low / stock.restored для публикации
+    event = parse_order_event(payload)
+    if event is None:
+        return False, []
+    order_id, event_type, needs = event
 
     db: Session = SessionLocal()
     try:
-        movements_created = 0
-        warnings = 0
-
-        for ing in ingredients:
-            ing_id = UUID(str(ing["ingredient_id"]))
-            need_qty = int(ing["quantity"])
-
-            stock = db.scalar(select(StockItem).where(StockItem.ingredient_id == ing_id))
-            if not stock:
-                warnings += 1
-                logger.warning("INVENTORY unknown ingredient_id=%s (order_id=%s)", ing_id, order_id)
-                continue
-
-            if stock.quantity < need_qty:
-                warnings += 1
-                logger.warning(
-                    "INVENTORY insufficient stock ingredient_id=%s have=%s need=%s (order_id=%s)",
-                    ing_id, stock.quantity, need_qty, order_id
-                )
-                # MVP-решение: не списываем, чтобы не уходить в минус
-                continue
-
-            # списание
-            stock.quantity -= need_qty
-
-            # движение
-            db.add(
-                InventoryMovement(
-                    ingredient_id=ing_id,
-                    quantity=need_qty,
-                    movement_type="OUT",
-                    order_id=UUID(str(order_id)),
-                )
-            )
-            movements_created += 1
+        if not ledger.claim(db, order_id, event_type):
+            db.rollback()
+            logger.info("INVENTORY duplicate event=%s order_id=%s skipped", event_type, order_id)
+            return True, []
+
+        result = deduct_stock(db, order_id, needs)
+        log_result(order_id, result)
 
         db.commit()
+        stock_events = after_commit([(needs, result)])
         logger.info(
             "INVENTORY processed order_id=%s movements=%s warnings=%s",
-            order_id, movements_created, warnings
+            order_id, len(result.deducted), len(result.skipped)
         )
+        return True, stock_events
 
     except Exception:
         db.rollback()
@@ -106,14 +194,169 @@ async def handle(payload: dict):
         db.close()
 
 
+def process_order_batch(payloads: list[dict]) -> tuple[list[tuple[UUID, str]], list[tuple[str, dict]]]:
+    # пачка заказов — одна транзакция: ledger, списание и движения для всех сразу;
+    # возвращает ключи, зафиксированные в processed_messages, и события по остаткам
+    events: dict[tuple[UUID, str], dict[UUID, int]] = {}
+    for payload in payloads:
+        event = parse_order_event(payload)
+        if event is not None:
+            order_id, event_type, needs = event
+            # дубль внутри пачки списываем один раз
+            events.setdefault((order_id, event_type), needs)
+    if not events:
+        return [], []
+
+    db: Session = SessionLocal()
+    try:
+        claimed = ledger.claim_many(db, list(events))
+        orders = [(key, needs) for key, needs in events.items() if key in claimed]
+
+        results = deduct_stock_batch(db, [(order_id, needs) for (order_id, _), needs in orders])
+        for ((order_id, _), _), result in zip(orders, results):
+            log_result(order_id, result)
+
+        db.commit()
+        stock_events = after_commit([(needs, result) for (_, needs), result in zip(orders, results)])
+        logger.info(
+            "INVENTORY processed batch orders=%s duplicates=%s movements=%s warnings=%s",
+            len(orders), len(events) - len(orders),
+            sum(len(r.deducted) for r in results), sum(len(r.skipped) for r in results),
+        )
+        return list(events), stock_events
+
+    except Exception:
+        db.rollback()
+        logger.exception("INVENTORY failed to process batch of %s orders", len(events))
+        raise
+    finally:
+        db.close()
+
+
+def read_stock() -> list[tuple[UUID, int, int]]:
+    db: Session = SessionLocal()
+    try:
+        return db.execute(
+            select(StockItem.ingredient_id, StockItem.quantity, StockItem.reorder_threshold)
+        ).all()
+    finally:
+        db.close()
+
+
+async def load_availability():
+    ids = await menu_client.list_item_ids()
+    items = await menu_client.get_items(ids) if ids else []
+    recipes = {k: v for k, v in recipes_from_menu(items).items() if v is not None}
+    rows = await run_db(read_stock)
+    availability.load(recipes, {ing_id: quantity for ing_id, quantity, _ in rows})
+    logger.info("INVENTORY availability loaded menu_items=%s", len(availability.recipes))
+
+
+async def handle_menu_changed(payload: dict):
+    ids = payload.get("menu_item_ids") or []
+    if not ids:
+        await load_availability()
+        return
+    recipes = recipes_from_menu(await menu_client.get_items(ids))
+    # позиции, которых menu-service больше не отдаёт, убираем из индекса
+    for menu_item_id in ids:
+        recipes.setdefault(UUID(str(menu_item_id)), None)
+    availability.update_recipes(recipes)
+    logger.info("INVENTORY availability recipes updated items=%s", len(ids))
+
+
+async def refresh_availability():
+    # страховка от рассинхрона: правки склада другими экземплярами сервиса
+    # и пропущенные menu.changed — упавший handle_menu_changed в эксклюзивной очереди
+    # не ретраится, поэтому рецепты целиком перечитываются раз в recipes_refresh_interval
+    loop = asyncio.get_running_loop()
+    recipes_loaded_at: float | None = None
+    while True:
+        try:
+            rows = await run_db(read_stock)
+            low_stock.load(rows)
+            recipes_due = (
+                recipes_loaded_at is None
+                or loop.time() - recipes_loaded_at >= settings.availability_recipes_refresh_interval
+            )
+            if recipes_due or not availability.ready:
+                await load_availability()
+                recipes_loaded_at = loop.time()
+            else:
+                availability.set_stock({ing_id: quantity for ing_id, quantity, _ in rows})
+        except Exception:
+            logger.exception("INVENTORY availability refresh failed")
+        await asyncio.sleep(settings.availability_refresh_interval)
+
+
+def prune_processed_messages() -> int:
+    db: Session = SessionLocal()
+    try:
+        pruned = ProcessedLedger.prune(db, timedelta(days=settings.processed_retention_days))
+        db.commit()
+        return pruned
+    finally:
+        db.close()
+
+
+async def daily_maintenance():
+    # раз в сутки: к концу месяца партиция следующего уже существует,
+    # а журнал обработанных событий не растёт бесконечно
+    while True:
+        await asyncio.sleep(24 * 3600)
+        try:
+            await run_db(ensure_movement_partitions, settings.movement_partitions_ahead)
+        except Exception:
+            logger.exception("INVENTORY movement partition maintenance failed")
+        try:
+            pruned = await run_db(prune_processed_messages)
+            logger.info("INVENTORY pruned processed_messages rows=%s", pruned)
+        except Exception:
+            logger.exception("INVENTORY processed_messages pruning failed")
+
+
 @app.on_event("startup")
 async def on_startup():
+    app.state.loop_lag = asyncio.create_task(monitor_loop_lag(settings.service_name))
+    app.state.consumer = consumer
+
     # Проверяем, что БД доступна (упадёт сразу, если DATABASE_URL неверный)
     ping_db()
     Base.metadata.create_all(bind=engine)
+    ensure_movement_order_id_nullable()
+    ensure_movement_partitions(settings.movement_partitions_ahead)
+    app.state.maintenance = asyncio.create_task(daily_maintenance())
+
+    app.state.publisher = RabbitPublisher(settings.rabbitmq_url)
+    await app.state.publisher.connect()
+
+    await menu_client.connect()
+    app.state.availability_refresh = asyncio.create_task(refresh_availability())
+    asyncio.create_task(menu_consumer.connect_and_consume(handle_menu_changed))
 
     print("INVENTORY consumer starting...")
-    asyncio.create_task(consumer.connect_and_consume(handle))
+    if settings.consumer_batch_mode:
+        asyncio.create_task(
+            consumer.connect_and_consume_batches(
+                handle_batch,
+                batch_size=settings.consumer_batch_size,
+                batch_timeout=settings.consumer_batch_timeout_ms / 1000,
+            )
+        )
+    else:
+        asyncio.create_task(consumer.connect_and_consume(handle))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # дожидаемся сообщений, которые уже в обработке
+    await consumer.close()
+    await menu_consumer.close()
+    app.state.availability_refresh.cancel()
+    app.state.maintenance.cancel()
+    await menu_client.close()
+    await app.state.publisher.close()
+    app.state.loop_lag.cancel()
 
 
 @app.get("/health")
@@ -0,0 +1,22 @@
+import uuid
+from datetime import date
+
+from sqlalchemy import Date, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class InventoryDailyRollup(Base):
+    __tablename__ = "inventory_daily_rollups"
+
+    # итоги движений за день по ингредиенту; обновляются в той же транзакции, что и движения
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    ingredient_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, index=True)
+
+    qty_in: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    qty_out: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # изменение остатка за день со знаком: IN - OUT + ADJUST
+    net: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    movements: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
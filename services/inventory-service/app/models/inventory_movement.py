@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, Integer, DateTime
+from sqlalchemy import String, Integer, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column
@@ -17,11 +17,20 @@ class InventoryMovement(Base):
     )
 
     ingredient_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
+    # OUT/IN — всегда положительное количество; ADJUST — разница со знаком (ручная правка остатка)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
 
-    movement_type: Mapped[str] = mapped_column(String, nullable=False)  # OUT
-    order_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
+    movement_type: Mapped[str] = mapped_column(String, nullable=False)  # OUT / IN / ADJUST
+    # у пополнений и ручных правок заказа нет
+    order_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True, index=True)
 
+    # ключ партиционирования: входит в PK, как того требует Postgres
     created_at: Mapped[datetime] = mapped_column(
-        DateTime, server_default=func.now(), nullable=False
+        DateTime, server_default=func.now(), nullable=False, primary_key=True
+    )
+
+    __table_args__ = (
+        Index("ix_inventory_movements_ingredient_created", "ingredient_id", "created_at"),
+        # помесячные партиции создаёт app.core.movements.ensure_movement_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
@@ -0,0 +1,24 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ProcessedMessage(Base):
+    __tablename__ = "processed_messages"
+
+    # ключ события: повторная доставка того же (order_id, event_type) не списывает склад второй раз
+    order_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    event_type: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    processed_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # ежедневная чистка журнала старше горизонта повторных доставок
+        Index("ix_processed_messages_processed_at", "processed_at"),
+    )
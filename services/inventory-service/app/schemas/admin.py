@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+
+class DeadLetterOut(BaseModel):
+    attempts: int
+    last_error: str | None = None
+    body: str
+
+
+class DeadLettersOut(BaseModel):
+    queue: str
+    messages: list[DeadLetterOut]
+
+
+class DeadLetterReplayOut(BaseModel):
+    queue: str
+    replayed: int
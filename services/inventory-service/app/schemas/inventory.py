@@ -42,6 +42,40 @@ class StockAddRequest(BaseModel):
     amount: int = Field(ge=1, le=1_000_000)
 
 
+class StockBulkItem(BaseModel):
+    ingredient_id: UUID
+    amount: int = Field(ge=1, le=1_000_000)
+
+
+class StockBulkRequest(BaseModel):
+    items: list[StockBulkItem] = Field(min_length=1, max_length=1000)
+
+
 class StockSetRequest(BaseModel):
     quantity: int = Field(ge=0, le=1_000_000)
     reorder_threshold: int = Field(ge=0, le=1_000_000)
+
+
+class StockAsOfOut(BaseModel):
+    ingredient_id: UUID
+    quantity: int
+    at: datetime
+
+
+class UsageOut(BaseModel):
+    ingredient_id: UUID
+    qty_in: int
+    qty_out: int
+    net: int
+
+
+class LowStockOut(BaseModel):
+    ingredient_id: UUID
+    quantity: int
+    reorder_threshold: int
+
+
+class AvailabilityOut(BaseModel):
+    menu_item_id: UUID
+    portions: int
+    available: bool
@@ -0,0 +1,89 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import insert, inspect, text
+
+from app.core.movements import ensure_movement_order_id_nullable, ensure_movement_partitions, stock_as_of
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+from app.models.ingredient import Ingredient
+from app.models.inventory_daily_rollup import InventoryDailyRollup
+from app.models.inventory_movement import InventoryMovement
+from app.models.stock_item import StockItem
+from tests.conftest import requires_postgres
+
+
+def test_stock_as_of_normalises_aware_time_to_utc(db_tables):
+    milk, beans = uuid.uuid4(), uuid.uuid4()
+    day = date(2026, 3, 10)
+    with SessionLocal() as db:
+        db.add_all([Ingredient(ingredient_id=milk, name="milk", unit="ml"),
+                    Ingredient(ingredient_id=beans, name="beans", unit="g")])
+        db.flush()
+        db.add_all([StockItem(ingredient_id=milk, quantity=100), StockItem(ingredient_id=beans, quantity=40)])
+        db.execute(
+            insert(InventoryMovement),
+            [
+                # до момента at (08:00 UTC) — уже в остатке на at
+                {"ingredient_id": milk, "quantity": 3, "movement_type": "OUT",
+                 "created_at": datetime(2026, 3, 10, 8, 0)},
+                # после at, но в тот же день — откатываем по журналу
+                {"ingredient_id": milk, "quantity": 5, "movement_type": "IN",
+                 "created_at": datetime(2026, 3, 10, 10, 0)},
+            ],
+        )
+        db.add(InventoryDailyRollup(day=day + timedelta(days=1), ingredient_id=milk,
+                                    qty_in=0, qty_out=7, net=-7, movements=1))
+        db.commit()
+
+        # 12:00 по Москве — 09:00 UTC
+        at = datetime(2026, 3, 10, 12, 0, tzinfo=timezone(timedelta(hours=3)))
+        assert stock_as_of(db, at) == {milk: 100 - 5 + 7, beans: 40}
+        assert stock_as_of(db, at.astimezone(timezone.utc).replace(tzinfo=None), [milk]) == {milk: 102}
+
+
+@requires_postgres
+def test_order_id_not_null_dropped_on_existing_table():
+    Base.metadata.drop_all(bind=engine)
+    # таблица в том виде, в каком она была до пополнений без заказа
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE inventory_movements ("
+                "movement_id UUID PRIMARY KEY, ingredient_id UUID NOT NULL, quantity INTEGER NOT NULL, "
+                "movement_type VARCHAR NOT NULL, order_id UUID NOT NULL, "
+                "created_at TIMESTAMP NOT NULL DEFAULT now())"
+            )
+        )
+
+    ensure_movement_order_id_nullable()
+    ensure_movement_order_id_nullable()
+
+    columns = {c["name"]: c for c in inspect(engine).get_columns("inventory_movements")}
+    assert columns["order_id"]["nullable"] is True
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO inventory_movements (movement_id, ingredient_id, quantity, movement_type) "
+                "VALUES (gen_random_uuid(), gen_random_uuid(), 5, 'IN')"
+            )
+        )
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE inventory_movements"))
+
+
+@requires_postgres
+def test_partitions_follow_database_date(db_tables):
+    ensure_movement_partitions(1)
+
+    with engine.connect() as conn:
+        today = conn.scalar(text("SELECT current_date"))
+        partitions = set(
+            conn.scalars(
+                text("SELECT relname FROM pg_inherits JOIN pg_class ON oid = inhrelid "
+                     "WHERE inhparent = 'inventory_movements'::regclass")
+            )
+        )
+    next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    assert {f"inventory_movements_{today:%Y_%m}", f"inventory_movements_{next_month:%Y_%m}"} <= partitions
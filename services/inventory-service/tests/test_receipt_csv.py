@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.receipt_csv import ReceiptCsv
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def _read(*parts: bytes) -> ReceiptCsv:
+    return asyncio.run(ReceiptCsv().read(_chunks(*parts)))
+
+
+def test_sums_rows_split_across_chunks():
+    body = "\ufeffname,amount\nмолоко,3\nмолоко,2\r\nsugar,1".encode()
+    # граница чанка посреди двухбайтового символа
+    receipt = _read(body[:20], body[20:])
+    assert receipt.by_name == {"молоко": 5, "sugar": 1}
+    assert receipt.rows == 3
+
+
+@pytest.mark.parametrize(
+    "parts",
+    [
+        (b"name,amount\nM\xff,3\n",),
+        # обрезанный многобайтовый символ в конце тела
+        (b"name,amount\nmilk,3\n", "б".encode()[:1]),
+    ],
+)
+def test_invalid_utf8_is_bad_request(parts):
+    with pytest.raises(HTTPException) as exc:
+        _read(*parts)
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "CSV must be UTF-8"
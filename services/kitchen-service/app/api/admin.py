@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Query, Request
+
+from app.schemas.admin import DeadLetterReplayOut, DeadLettersOut
+
+# служебные ручки для разбора <queue>.dead; снаружи закрыты в nginx
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/dead-letters", response_model=DeadLettersOut)
+async def list_dead_letters(request: Request, limit: int = Query(50, ge=1, le=500)):
+    consumer = request.app.state.consumer
+    messages = await consumer.peek_dead_letters(limit)
+    return {"queue": consumer.dead_queue_name, "messages": messages}
+
+
+@router.post("/dead-letters:replay", response_model=DeadLetterReplayOut)
+async def replay_dead_letters(request: Request, limit: int = Query(50, ge=1, le=500)):
+    consumer = request.app.state.consumer
+    replayed = await consumer.replay_dead_letters(limit)
+    return {"queue": consumer.queue_name, "replayed": replayed}
@@ -1,17 +1,126 @@
+import asyncio
+import json
 from datetime import datetime, timezone
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.active_queue import ACTIVE_STATUSES, ActiveQueue
+from app.core.queue_hub import QueueHub
+from app.db.session import SessionLocal, get_db
 from app.models.kitchen_order import KitchenOrder
+from app.models.outbox_event import OutboxEvent
 from app.schemas.kitchen import KitchenQueueItemOut
-from app.schemas.kitchen import KitchenOrderOut
+from app.schemas.kitchen import KitchenOrderOut, KitchenTransitionRequest, KitchenTransitionResult
 
 router = APIRouter(tags=["kitchen"])
 
+# изменения очереди для /orders/stream: новые тикеты из консьюмера и start/complete из API
+queue_hub = QueueHub()
+# активная очередь в памяти: GET /orders и снимок стрима читают её, а не БД
+active_queue = ActiveQueue()
+
+
+def ticket_of(row) -> dict:
+    return KitchenQueueItemOut.model_validate(row).model_dump(mode="json")
+
+
+def push_ticket(ticket: dict) -> None:
+    # вызывать после commit: сначала индекс, потом подписчики стрима;
+    # устаревший пуш (статус назад) индекс отбросит — в стрим его тоже не шлём
+    if active_queue.apply(ticket):
+        queue_hub.publish(ticket)
+
+
+def ticket_changed(row) -> None:
+    push_ticket(ticket_of(row))
+
+
+def load_active_queue() -> list[dict]:
+    # читает по частичному индексу ix_kitchen_orders_active_created
+    db: Session = SessionLocal()
+    try:
+        rows = db.scalars(
+            select(KitchenOrder)
+            .where(KitchenOrder.status.in_(ACTIVE_STATUSES))
+            .order_by(KitchenOrder.created_at.asc())
+        ).all()
+        return [ticket_of(r) for r in rows]
+    finally:
+        db.close()
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def enqueue_status(db: Session, routing_key: str, row: KitchenOrder) -> None:
+    # kitchen.started / kitchen.completed: order-service обновляет по ним историю заказов.
+    # Событие пишется в outbox до commit — вместе со статусом, публикует его OutboxRelay
+    event = {
+        "event_type": "KitchenStatusChanged",
+        "order_id": str(row.order_id),
+        "status": row.status,
+        "started_at": row.started_at.isoformat() if row.started_at else None,
+        "completed_at": row.completed_at.isoformat() if row.completed_at else None,
+    }
+    db.add(OutboxEvent(routing_key=routing_key, payload=event))
+
+
+def apply_start(db: Session, row: KitchenOrder) -> None:
+    if row.started_at is None:
+        row.started_at = datetime.now(timezone.utc).replace(tzinfo=None)  # TIMESTAMP без TZ
+    row.status = "IN_PROGRESS"
+    enqueue_status(db, "kitchen.started", row)
+
+
+def apply_complete(db: Session, row: KitchenOrder) -> None:
+    if row.started_at is None:
+        # если бариста нажал "готово" сразу — стартуем автоматически
+        row.started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        row.status = "IN_PROGRESS"
+
+    row.completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    row.status = "DONE"
+    enqueue_status(db, "kitchen.completed", row)
+
+
+# объявлен раньше /orders/{order_id}, иначе "stream" попадёт в order_id
+@router.get("/orders/stream")
+async def stream_queue():
+    """SSE: один снимок активной очереди (event: snapshot), дальше только изменения (event: ticket).
+
+    Тикет со статусом DONE означает, что его надо убрать с экрана.
+    """
+    # подписываемся до снимка: изменение между ними придёт повторно, а не потеряется
+    subscription = queue_hub.subscribe()
+    _, snapshot = active_queue.snapshot()
+
+    async def events():
+        try:
+            yield sse("snapshot", snapshot)
+            while True:
+                try:
+                    ticket = await asyncio.wait_for(subscription.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # комментарий-heartbeat: держит соединение через nginx
+                    yield ": ping\n\n"
+                    continue
+                if ticket is None:
+                    return
+                yield sse("ticket", ticket)
+        finally:
+            queue_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.get("/orders/{order_id}", response_model=KitchenOrderOut)
 def get_kitchen_order(order_id: UUID, db: Session = Depends(get_db)):
@@ -22,7 +131,11 @@ def get_kitchen_order(order_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.post("/orders/{order_id}/start", response_model=KitchenOrderOut)
-def start_order(order_id: UUID, db: Session = Depends(get_db)):
+def start_order(
+    order_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+):
     row = db.scalar(select(KitchenOrder).where(KitchenOrder.order_id == order_id))
     if not row:
         raise HTTPException(status_code=404, detail="Kitchen order not found")
@@ -30,17 +143,21 @@ def start_order(order_id: UUID, db: Session = Depends(get_db)):
     if row.status == "DONE":
         raise HTTPException(status_code=409, detail="Order already completed")
 
-    if row.started_at is None:
-        row.started_at = datetime.now(timezone.utc).replace(tzinfo=None)  # TIMESTAMP без TZ
-    row.status = "IN_PROGRESS"
+    apply_start(db, row)
 
     db.commit()
     db.refresh(row)
+    request.app.state.outbox_relay.notify()
+    ticket_changed(row)
     return row
 
 
 @router.post("/orders/{order_id}/complete", response_model=KitchenOrderOut)
-def complete_order(order_id: UUID, db: Session = Depends(get_db)):
+def complete_order(
+    order_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+):
     row = db.scalar(select(KitchenOrder).where(KitchenOrder.order_id == order_id))
     if not row:
         raise HTTPException(status_code=404, detail="Kitchen order not found")
@@ -48,24 +165,105 @@ def complete_order(order_id: UUID, db: Session = Depends(get_db)):
     if row.status == "DONE":
         raise HTTPException(status_code=409, detail="Order already completed")
 
-    if row.started_at is None:
-        # если бариста нажал "готово" сразу — стартуем автоматически
-        row.started_at = datetime.now(timezone.utc).replace(tzinfo=None)
-        row.status = "IN_PROGRESS"
-
-    row.completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
-    row.status = "DONE"
+    apply_complete(db, row)
 
     db.commit()
     db.refresh(row)
+    request.app.state.outbox_relay.notify()
+    ticket_changed(row)
     return row
 
 
+@router.post("/orders:transition", response_model=list[KitchenTransitionResult])
+def transition_orders(
+    body: KitchenTransitionRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Start/complete сразу для нескольких заказов (поднос напитков) одной транзакцией.
+
+    Ошибка по отдельному заказу не валит остальные — она в его строке результата.
+    """
+    order_ids = list(dict.fromkeys(body.order_ids))
+    # блокируем в порядке order_id: две пачки с общими заказами не ловят deadlock
+    rows = {
+        row.order_id: row
+        for row in db.scalars(
+            select(KitchenOrder)
+            .where(KitchenOrder.order_id.in_(order_ids))
+            .order_by(KitchenOrder.order_id)
+            .with_for_update()
+        )
+    }
+    apply = apply_start if body.action == "start" else apply_complete
+
+    results, changed = [], []
+    for order_id in order_ids:
+        row = rows.get(order_id)
+        if not row:
+            results.append({"order_id": order_id, "ok": False, "error": "not_found"})
+            continue
+        if row.status == "DONE":
+            results.append(
+                {
+                    "order_id": order_id,
+                    "ok": False,
+                    "error": "already_completed",
+                    "status": row.status,
+                    "started_at": row.started_at,
+                    "completed_at": row.completed_at,
+                }
+            )
+            continue
+        apply(db, row)
+        changed.append(row)
+        results.append(
+            {
+                "order_id": order_id,
+                "ok": True,
+                "status": row.status,
+                "started_at": row.started_at,
+                "completed_at": row.completed_at,
+            }
+        )
+
+    if changed:
+        # тикеты собираем до commit: после него строки expired и каждая перечиталась бы отдельно
+        tickets = [ticket_of(row) for row in changed]
+        db.commit()
+        request.app.state.outbox_relay.notify()
+        for ticket in tickets:
+            push_ticket(ticket)
+    return results
+
+
 @router.get("/orders", response_model=list[KitchenQueueItemOut])
 def list_queue(
-    status: list[str] = Query(default=["NEW", "IN_PROGRESS"]),
+    request: Request,
+    status: list[str] | None = Query(default=None),
+    ids: list[UUID] | None = Query(default=None, max_length=500),
     db: Session = Depends(get_db),
 ):
+    if ids:
+        # статусы конкретных заказов одним запросом по ix_kitchen_orders_order_id;
+        # без status отдаём заказы в любом статусе, включая DONE
+        stmt = select(KitchenOrder).where(KitchenOrder.order_id.in_(ids))
+        if status:
+            stmt = stmt.where(KitchenOrder.status.in_(status))
+        return db.scalars(stmt).all()
+
+    # по умолчанию — активная очередь
+    status = status or list(ACTIVE_STATUSES)
+    if set(status) <= set(ACTIVE_STATUSES):
+        etag, tickets = active_queue.snapshot(status)
+        # no-cache: браузер хранит ответ, но каждый раз сверяет ETag
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", "").split(", "):
+            return Response(status_code=304, headers=headers)
+        # тикеты уже сериализованы в индексе — отдаём как есть, без повторной валидации
+        return JSONResponse(tickets, headers=headers)
+
+    # DONE и прочие статусы в индексе не держим — идём в БД
     rows = db.scalars(
         select(KitchenOrder)
         .where(KitchenOrder.status.in_(status))
@@ -0,0 +1,109 @@
+import bisect
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+ACTIVE_STATUSES = ("NEW", "IN_PROGRESS")
+
+# статусы тикета только растут: NEW -> IN_PROGRESS -> DONE
+STATUS_RANK = {"NEW": 0, "IN_PROGRESS": 1, "DONE": 2}
+
+
+class ActiveQueue:
+    """Активные тикеты кухни (NEW / IN_PROGRESS) в памяти, по порядку created_at.
+
+    Заполняется из БД на старте, дальше обновляется консьюмером и переходами
+    start/complete — очередь для экранов бариста читается отсюда, без запроса в БД.
+    Версия меняется на каждое изменение и служит ETag.
+
+    Пуши после commit идут из разных потоков и могут прийти не по порядку, поэтому
+    откат статуса назад игнорируется, а завершённые заказы помнятся (tombstone),
+    чтобы запоздавший NEW/IN_PROGRESS не вернул DONE-тикет в очередь.
+    """
+
+    def __init__(self, max_done: int = 10_000):
+        self._lock = threading.Lock()
+        self._tickets: dict[str, dict] = {}
+        # order_id -> ключ сортировки, сам порядок — отсортированный список ключей
+        self._keys: dict[str, tuple[datetime, str]] = {}
+        self._order: list[tuple[datetime, str]] = []
+        # order_id -> версия, на которой тикет последний раз менялся через apply()
+        self._touched: dict[str, int] = {}
+        # недавно завершённые заказы: DONE — конечный статус
+        self._done: OrderedDict[str, None] = OrderedDict()
+        self.max_done = max_done
+        # версия с меткой процесса: после рестарта старые ETag клиентов не совпадут
+        self._boot = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.loaded = False
+
+    def load(self, tickets: list[dict], since: int | None = None) -> bool:
+        """Пересобирает индекс из выборки БД. Возвращает True, если содержимое изменилось.
+
+        since — версия индекса до начала чтения из БД: тикеты, изменённые после неё,
+        новее выборки и сохраняются как есть.
+        """
+        with self._lock:
+            fresh = {t["order_id"]: t for t in tickets if t["order_id"] not in self._done}
+            if since is not None:
+                for order_id, version in self._touched.items():
+                    if version > since:
+                        fresh[order_id] = self._tickets[order_id]
+
+            if self.loaded and fresh == self._tickets:
+                return False
+
+            self._tickets.clear()
+            self._keys.clear()
+            self._order.clear()
+            self._touched.clear()
+            for ticket in fresh.values():
+                self._put(ticket)
+            self.version += 1
+            self.loaded = True
+            return True
+
+    def apply(self, ticket: dict) -> bool:
+        # тикет в любом статусе: активный — вставить/заменить, DONE — убрать;
+        # False — пуш устарел и проигнорирован
+        order_id = ticket["order_id"]
+        with self._lock:
+            if order_id in self._done:
+                return False
+            current = self._tickets.get(order_id)
+            if current and STATUS_RANK.get(ticket["status"], 0) < STATUS_RANK.get(current["status"], 0):
+                return False
+
+            self._drop(order_id)
+            self.version += 1
+            if ticket["status"] in ACTIVE_STATUSES:
+                self._put(ticket)
+                self._touched[order_id] = self.version
+            else:
+                self._done[order_id] = None
+                while len(self._done) > self.max_done:
+                    self._done.popitem(last=False)
+            return True
+
+    def snapshot(self, statuses=ACTIVE_STATUSES) -> tuple[str, list[dict]]:
+        with self._lock:
+            etag = f'"{self._boot}-{self.version}"'
+            tickets = [self._tickets[oid] for _, oid in self._order]
+        return etag, [t for t in tickets if t["status"] in statuses]
+
+    def _put(self, ticket: dict) -> None:
+        order_id = ticket["order_id"]
+        key = (datetime.fromisoformat(ticket["created_at"]), order_id)
+        self._tickets[order_id] = ticket
+        self._keys[order_id] = key
+        # новые тикеты почти всегда самые поздние — insort вставляет в хвост
+        bisect.insort(self._order, key)
+
+    def _drop(self, order_id: str) -> None:
+        key = self._keys.pop(order_id, None)
+        if key is None:
+            return
+        del self._order[bisect.bisect_left(self._order, key)]
+        del self._tickets[order_id]
+        self._touched.pop(order_id, None)
@@ -0,0 +1,21 @@
+import asyncio
+
+from prometheus_client import Histogram
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop wakes up a periodic sleep (seconds)",
+    ["service"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+async def monitor_loop_lag(service: str, interval: float = 0.5) -> None:
+    # спим interval и смотрим, насколько позже нас разбудили:
+    # всё сверх interval — время, когда loop был занят чужим синхронным кодом
+    loop = asyncio.get_running_loop()
+    lag = EVENT_LOOP_LAG.labels(service=service)
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, loop.time() - start - interval))
@@ -0,0 +1,64 @@
+import asyncio
+
+
+class QueueHub:
+    """Раздача изменений очереди кухни всем подписчикам стрима внутри процесса.
+
+    publish() вызывается из потоков (консьюмер в db_executor, sync-ручки FastAPI),
+    поэтому в event loop попадаем через call_soon_threadsafe.
+    """
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.subscribers: set[asyncio.Queue] = set()
+        self.closed = False
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        if self.closed:
+            queue.put_nowait(None)
+        else:
+            self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def publish(self, ticket: dict) -> None:
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._fanout, ticket)
+
+    def close(self) -> None:
+        # остановка сервиса: завершаем все стримы, иначе graceful shutdown ждёт их вечно
+        self.closed = True
+        self._end_all()
+
+    def reset(self) -> None:
+        # очередь пересобрана из БД: клиенты переподключатся и получат свежий снимок
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._end_all)
+
+    def _end_all(self) -> None:
+        for queue in list(self.subscribers):
+            self._end(queue)
+
+    def _fanout(self, ticket: dict) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(ticket)
+            except asyncio.QueueFull:
+                # клиент не успевает читать: закрываем его стрим,
+                # после переподключения он получит свежий снимок
+                self._end(queue)
+
+    def _end(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
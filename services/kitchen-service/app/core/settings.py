@@ -6,6 +6,30 @@ class Settings(BaseSettings):
     database_url: str
     rabbitmq_url: str
 
+    # RabbitMQ consumer
+    consumer_prefetch: int = 32
+    consumer_concurrency: int = 16
+    # упавшее сообщение ретраится с паузой base * 2^(n-1) сек, после max_attempts — в <queue>.dead;
+    # TTL зашит в аргументы очередей <queue>.retry.N: после изменения их нужно пересоздать
+    consumer_max_attempts: int = 5
+    consumer_retry_base_delay: float = 1.0
+    # потоки под синхронную работу консьюмера с БД (не больше пула соединений engine)
+    consumer_db_threads: int = 8
+    # микро-пакеты: до batch_size сообщений или batch_timeout_ms на пачку, одна транзакция
+    consumer_batch_mode: bool = True
+    consumer_batch_size: int = 200
+    consumer_batch_timeout_ms: int = 50
+
+    # сверка активной очереди в памяти с БД (частичный индекс по NEW / IN_PROGRESS)
+    active_queue_resync_interval: float = 60.0
+
+    # outbox relay (kitchen.started / kitchen.completed)
+    outbox_batch_size: int = 100
+    outbox_poll_interval: float = 1.0
+    # отправленные события удаляются из outbox_events через outbox_retention секунд
+    outbox_retention: float = 604800.0
+    outbox_purge_interval: float = 3600.0
+
     model_config = SettingsConfigDict(env_file=None, extra="ignore")
 
 
@@ -0,0 +1,15 @@
+from sqlalchemy import Connection, MetaData
+from sqlalchemy.schema import CreateIndex
+
+
+def ensure_indexes(conn: Connection, metadata: MetaData) -> None:
+    """Докатывает индексы моделей на уже существующие таблицы.
+
+    create_all создаёт индексы только вместе с новой таблицей, поэтому индекс,
+    добавленный в __table_args__ позже, до работающей БД сам не доедет.
+    CREATE INDEX IF NOT EXISTS идемпотентен: на актуальной схеме это no-op.
+    На большой таблице индекс лучше заранее построить CONCURRENTLY под тем же именем.
+    """
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
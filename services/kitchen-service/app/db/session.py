@@ -1,4 +1,7 @@
-from typing import Generator
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generator, TypeVar
+
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 
@@ -7,6 +10,19 @@ from app.core.settings import settings
 engine = create_engine(settings.database_url, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# консьюмер работает на том же event loop, что и HTTP (/health, /metrics, API),
+# поэтому блокирующие вызовы Session уводим в отдельный ограниченный пул потоков
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.consumer_db_threads, thread_name_prefix="consumer-db"
+)
+
+T = TypeVar("T")
+
+
+async def run_db(fn: Callable[..., T], *args) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, fn, *args)
+
 
 def ping_db() -> None:
     with engine.connect() as conn:
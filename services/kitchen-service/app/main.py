@@ -1,19 +1,27 @@
 from fastapi import FastAPI
 from app.core.settings import settings
-from app.db.session import engine, ping_db
+from app.db.session import engine, ping_db, run_db
+from app.core.loop_lag import monitor_loop_lag
 import asyncio
+import signal
 from app.messaging.consumer import RabbitConsumer
+from app.messaging.outbox import OutboxRelay
+from app.messaging.rabbit import RabbitPublisher
 
 from app.db.base import Base
+from app.db.schema import ensure_indexes
 from app.models import kitchen_order as _kitchen_order
+from app.models import outbox_event as _outbox_event  # noqa: F401
 
 from uuid import UUID
 import logging
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.db.session import SessionLocal  # если у тебя так называется фабрика сессий
 from app.models.kitchen_order import KitchenOrder
-from app.api.kitchen import router as kitchen_router
+from app.api.kitchen import active_queue, load_active_queue, queue_hub, router as kitchen_router, ticket_changed
+from app.api.admin import router as admin_router
 
 
 
@@ -22,12 +30,18 @@ app = FastAPI(title=settings.service_name)
 
 
 app.include_router(kitchen_router)
+app.include_router(admin_router)
 
 
 consumer = RabbitConsumer(
     amqp_url=settings.rabbitmq_url,
     queue_name="kitchen.order.created",
     routing_key="order.created",
+    prefetch=settings.consumer_prefetch,
+    concurrency=settings.consumer_concurrency,
+    max_attempts=settings.consumer_max_attempts,
+    retry_base_delay=settings.consumer_retry_base_delay,
+    ordering_key=lambda p: p.get("order_id"),
 )
 
 logger = logging.getLogger("coffee")
@@ -35,6 +49,15 @@ logging.basicConfig(level=logging.INFO)
 
 
 async def handle(payload: dict):
+    await run_db(store_order, payload)
+
+
+async def handle_batch(payloads: list[dict]):
+    await run_db(store_batch, payloads)
+
+
+def store_order(payload: dict):
+    # синхронная часть: выполняется в db_executor, а не на event loop
     order_id = payload.get("order_id")
     items = payload.get("items", [])
     if not order_id:
@@ -50,6 +73,8 @@ async def handle(payload: dict):
         )
         db.add(row)
         db.commit()
+        db.refresh(row)
+        ticket_changed(row)
         logger.info("KITCHEN queued order_id=%s items=%s", order_id, len(items))
     except Exception:
         db.rollback()
@@ -58,15 +83,135 @@ async def handle(payload: dict):
     finally:
         db.close()
 
+def store_batch(payloads: list[dict]):
+    rows = []
+    for payload in payloads:
+        order_id = payload.get("order_id")
+        if not order_id:
+            logger.warning("KITCHEN got event without order_id: %s", payload)
+            continue
+        rows.append(
+            {
+                "order_id": UUID(str(order_id)),
+                "status": "NEW",
+                "items": {"items": payload.get("items", []), "channel": payload.get("channel")},
+            }
+        )
+    if not rows:
+        return
+
+    # одна транзакция и один multi-row INSERT на всю пачку
+    db: Session = SessionLocal()
+    try:
+        # RETURNING отдаёт created_at от БД — тикеты сразу попадают в активную очередь и стрим
+        stored = db.execute(
+            insert(KitchenOrder)
+            .values(rows)
+            .returning(
+                KitchenOrder.order_id,
+                KitchenOrder.status,
+                KitchenOrder.created_at,
+                KitchenOrder.started_at,
+                KitchenOrder.completed_at,
+                KitchenOrder.items,
+            )
+        ).all()
+        db.commit()
+        for row in stored:
+            ticket_changed(row)
+        logger.info("KITCHEN queued batch orders=%s", len(rows))
+    except Exception:
+        db.rollback()
+        logger.exception("KITCHEN failed to store batch of %s kitchen orders", len(rows))
+        raise
+    finally:
+        db.close()
+
+
+async def resync_active_queue():
+    # страховка от рассинхрона индекса с БД (потерянный пуш, правка мимо API):
+    # пересобираем по частичному индексу, тикеты новее выборки не трогаем
+    while True:
+        await asyncio.sleep(settings.active_queue_resync_interval)
+        try:
+            since = active_queue.version
+            if active_queue.load(await run_db(load_active_queue), since=since):
+                logger.info("KITCHEN active queue resynced from DB")
+                queue_hub.reset()
+        except Exception:
+            logger.exception("KITCHEN active queue resync failed")
+
+
+def close_streams_on_exit() -> None:
+    # uvicorn при остановке сначала ждёт завершения открытых ответов и только потом
+    # зовёт on_shutdown, а SSE-стримы сами не кончаются — закрываем их уже по сигналу
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(queue_hub.close)
+            previous(signum, frame)
+
+        try:
+            signal.signal(sig, handler)
+        except ValueError:
+            # не главный поток (например, TestClient) — остаётся закрытие в on_shutdown
+            return
+
+
 @app.on_event("startup")
 async def on_startup():
+    app.state.loop_lag = asyncio.create_task(monitor_loop_lag(settings.service_name))
+    app.state.consumer = consumer
+    # консьюмер и sync-ручки публикуют в стрим из потоков — им нужен loop приложения
+    queue_hub.bind(asyncio.get_running_loop())
+    close_streams_on_exit()
 
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        ensure_indexes(conn, Base.metadata)
     # Проверяем, что БД доступна (упадёт сразу, если DATABASE_URL неверный)
     ping_db()
+    # индекс активной очереди заполняем до старта консьюмера — дальше он только дополняет
+    active_queue.load(await run_db(load_active_queue))
+    app.state.queue_resync = asyncio.create_task(resync_active_queue())
+
+    app.state.publisher = RabbitPublisher(settings.rabbitmq_url)
+    await app.state.publisher.connect()
+
+    app.state.outbox_relay = OutboxRelay(
+        app.state.publisher,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval,
+        retention=settings.outbox_retention,
+        purge_interval=settings.outbox_purge_interval,
+    )
+    app.state.outbox_relay.start()
 
     print("KITCHEN consumer starting...")
-    asyncio.create_task(consumer.connect_and_consume(handle))
+    if settings.consumer_batch_mode:
+        asyncio.create_task(
+            consumer.connect_and_consume_batches(
+                handle_batch,
+                batch_size=settings.consumer_batch_size,
+                batch_timeout=settings.consumer_batch_timeout_ms / 1000,
+            )
+        )
+    else:
+        asyncio.create_task(consumer.connect_and_consume(handle))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    queue_hub.close()
+    app.state.queue_resync.cancel()
+    await consumer.close()
+    app.state.loop_lag.cancel()
+    await app.state.outbox_relay.stop()
+    await app.state.publisher.close()
 
 
 @app.get("/health")
@@ -1,35 +1,362 @@
+import asyncio
 import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
 import aio_pika
 from aio_pika import ExchangeType
 
 EXCHANGE_NAME = "coffee.events"
 
+# номер попытки и последняя ошибка едут в заголовках сообщения
+ATTEMPT_HEADER = "x-attempt"
+ERROR_HEADER = "x-last-error"
+
+logger = logging.getLogger("coffee")
+
+
+class _KeyLock:
+    # users = держатель + ожидающие: запись удаляется, только когда ключ никому не нужен
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
 
 class RabbitConsumer:
-    def __init__(self, amqp_url: str, queue_name: str, routing_key: str):
+    def __init__(
+        self,
+        amqp_url: str,
+        queue_name: str,
+        routing_key: str,
+        prefetch: int = 32,
+        concurrency: int = 16,
+        ordering_key: Callable[[dict], str | None] | None = None,
+        exclusive: bool = False,
+        drain_timeout: float = 30.0,
+        max_attempts: int = 5,
+        retry_base_delay: float = 1.0,
+    ):
         self.amqp_url = amqp_url
         self.queue_name = queue_name
         self.routing_key = routing_key
 
+        # prefetch ограничивает, сколько неподтверждённых сообщений брокер отдаст нам,
+        # concurrency — сколько из них обрабатываются одновременно
+        self.prefetch = prefetch
+        self.concurrency = concurrency
+        # если задан: сообщения с одинаковым ключом (например order_id) идут строго по очереди
+        self.ordering_key = ordering_key
+        # exclusive-очередь живёт, пока жив процесс: нужна для событий,
+        # которые должен получить каждый экземпляр сервиса (сброс кэша)
+        self.exclusive = exclusive
+        self.drain_timeout = drain_timeout
+        # упавшее сообщение не возвращается в голову очереди, а уходит в <queue>.retry.N
+        # с TTL retry_base_delay * 2^(N-1); после max_attempts попыток — в <queue>.dead
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+
         self.connection: aio_pika.RobustConnection | None = None
         self.channel: aio_pika.RobustChannel | None = None
+        # отдельный канал с confirm: копия в retry/dead должна дойти до брокера раньше ack
+        self.retry_channel: aio_pika.RobustChannel | None = None
+        self.retry_exchange: aio_pika.abc.AbstractExchange | None = None
 
-    async def connect_and_consume(self, handler):
+        self._iterator = None
+        self._consumer_tag = None
+        self._batch_queue = None
+        self._buffer: asyncio.Queue | None = None
+        self._stopping = False
+        self._tasks: set[asyncio.Task] = set()
+        self._key_locks: dict[str, _KeyLock] = {}
+
+    async def _declare_queue(self, prefetch: int) -> aio_pika.abc.AbstractQueue:
         self.connection = await aio_pika.connect_robust(self.amqp_url)
         self.channel = await self.connection.channel()
+        await self.channel.set_qos(prefetch_count=prefetch)
         exchange = await self.channel.declare_exchange(
             EXCHANGE_NAME, ExchangeType.TOPIC, durable=True
         )
 
-        queue = await self.channel.declare_queue(self.queue_name, durable=True)
+        queue = await self.channel.declare_queue(
+            self.queue_name,
+            durable=not self.exclusive,
+            exclusive=self.exclusive,
+            auto_delete=self.exclusive,
+        )
         await queue.bind(exchange, routing_key=self.routing_key)
 
+        if not self.exclusive:
+            await self._declare_retry_topology()
+        return queue
+
+    @property
+    def dead_queue_name(self) -> str:
+        return f"{self.queue_name}.dead"
+
+    async def _declare_retry_topology(self) -> None:
+        # <queue>.retry — direct-обменник; очереди задержки без консьюмеров по TTL
+        # возвращают сообщение через default exchange прямо в основную очередь
+        self.retry_channel = await self.connection.channel(publisher_confirms=True)
+        self.retry_exchange = await self.retry_channel.declare_exchange(
+            f"{self.queue_name}.retry", ExchangeType.DIRECT, durable=True
+        )
+        for attempt in range(1, self.max_attempts):
+            delay_queue = await self.retry_channel.declare_queue(
+                f"{self.queue_name}.retry.{attempt}",
+                durable=True,
+                arguments={
+                    "x-message-ttl": int(self.retry_base_delay * 2 ** (attempt - 1) * 1000),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": self.queue_name,
+                },
+            )
+            await delay_queue.bind(self.retry_exchange, routing_key=f"retry.{attempt}")
+
+        dead_queue = await self.retry_channel.declare_queue(self.dead_queue_name, durable=True)
+        await dead_queue.bind(self.retry_exchange, routing_key="dead")
+
+    async def connect_and_consume(self, handler: Callable[[dict], Awaitable[None]]):
+        queue = await self._declare_queue(self.prefetch)
+
+        slots = asyncio.Semaphore(self.concurrency)
         async with queue.iterator() as qiter:
+            self._iterator = qiter
             async for message in qiter:
-                async with message.process(requeue=True):
-                    payload = json.loads(message.body.decode("utf-8"))
-                    await handler(payload)
+                if self._stopping:
+                    break
+                await slots.acquire()
+                task = asyncio.create_task(self._process(message, handler, slots))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, message: aio_pika.abc.AbstractIncomingMessage, handler, slots: asyncio.Semaphore):
+        try:
+            key = self._ordering_key_of(message)
+            if key is None:
+                await self._handle(message, handler)
+            else:
+                async with self._key_lock(key):
+                    await self._handle(message, handler)
+        except Exception:
+            logger.exception("consumer %s failed to process message", self.queue_name)
+        finally:
+            slots.release()
+
+    async def _handle(self, message: aio_pika.abc.AbstractIncomingMessage, handler):
+        try:
+            payload = json.loads(message.body.decode("utf-8"))
+        except ValueError as exc:
+            # битый JSON повторять бессмысленно
+            await self._dead_letter(message, exc)
+            return
+
+        try:
+            await handler(payload)
+        except Exception as exc:
+            await self._poison(message, exc)
+            raise
+        await message.ack()
+
+    async def connect_and_consume_batches(
+        self,
+        batch_handler: Callable[[list[dict]], Awaitable[None]],
+        batch_size: int = 100,
+        batch_timeout: float = 0.05,
+    ):
+        # микро-пакеты: копим до batch_size сообщений или batch_timeout секунд,
+        # отдаём пачку обработчику (одна транзакция) и подтверждаем её одним ack(multiple=True)
+        queue = await self._declare_queue(max(self.prefetch, batch_size))
+
+        self._buffer = asyncio.Queue()
+        self._batch_queue = queue
+        self._consumer_tag = await queue.consume(self._buffer.put)
+
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            first = await self._buffer.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + batch_timeout
+            while len(batch) < batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self._buffer.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    self._stopping = True
+                    break
+                batch.append(message)
+
+            task = asyncio.create_task(self._process_batch(batch, batch_handler))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            await task
+
+    async def _process_batch(self, batch: list, batch_handler):
+        good, payloads = [], []
+        for message in batch:
+            try:
+                payloads.append(json.loads(message.body.decode("utf-8")))
+                good.append(message)
+            except ValueError as exc:
+                await self._dead_letter(message, exc)
+
+        if good:
+            await self._run_batch(good, payloads, batch_handler)
+
+    async def _run_batch(self, messages: list, payloads: list[dict], batch_handler):
+        try:
+            await batch_handler(payloads)
+        except Exception as exc:
+            if len(messages) == 1:
+                logger.exception("consumer %s failed to process message", self.queue_name)
+                await self._poison(messages[0], exc)
+                return
+            # делим пополам, пока не останется отравленное сообщение;
+            # половины идут по порядку delivery tag, поэтому ack(multiple) ниже безопасен
+            mid = len(messages) // 2
+            await self._run_batch(messages[:mid], payloads[:mid], batch_handler)
+            await self._run_batch(messages[mid:], payloads[mid:], batch_handler)
+            return
+
+        # все более ранние теги этого канала уже подтверждены или отклонены
+        await messages[-1].ack(multiple=True)
+
+    async def _poison(self, message: aio_pika.abc.AbstractIncomingMessage, exc: Exception):
+        attempt = int((message.headers or {}).get(ATTEMPT_HEADER, 1))
+        if attempt >= self.max_attempts:
+            await self._dead_letter(message, exc)
+            return
+        await self._republish(message, f"retry.{attempt}", attempt + 1, exc)
+        logger.warning(
+            "consumer %s retry %s/%s in %.1fs: %r",
+            self.queue_name, attempt + 1, self.max_attempts,
+            self.retry_base_delay * 2 ** (attempt - 1), exc,
+        )
+
+    async def _dead_letter(self, message: aio_pika.abc.AbstractIncomingMessage, exc: Exception):
+        attempt = int((message.headers or {}).get(ATTEMPT_HEADER, 1))
+        await self._republish(message, "dead", attempt, exc)
+        logger.error("consumer %s dead-lettered message after %s attempts: %r", self.queue_name, attempt, exc)
+
+    async def _republish(self, message: aio_pika.abc.AbstractIncomingMessage, routing_key: str, attempt: int, exc: Exception):
+        if self.retry_exchange is None:
+            # exclusive-очередь без retry-топологии: сообщение просто отбрасываем, не крутим по кругу
+            await message.reject(requeue=False)
+            return
+        try:
+            await self.retry_exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    content_type=message.content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers={
+                        **(message.headers or {}),
+                        ATTEMPT_HEADER: attempt,
+                        ERROR_HEADER: repr(exc)[:500],
+                    },
+                ),
+                routing_key=routing_key,
+            )
+        except Exception:
+            # брокер не принял копию — вернём оригинал в очередь, чтобы не потерять
+            logger.exception("consumer %s failed to park message, requeueing", self.queue_name)
+            await message.nack(requeue=True)
+            return
+        await message.ack()
+
+    async def peek_dead_letters(self, limit: int = 50) -> list[dict]:
+        # забираем без ack и возвращаем обратно nack(requeue) — очередь не меняется
+        if self.retry_channel is None:
+            return []
+        queue = await self.retry_channel.get_queue(self.dead_queue_name)
+        taken = []
+        try:
+            while len(taken) < limit:
+                message = await queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                taken.append(message)
+            return [
+                {
+                    "attempts": int((m.headers or {}).get(ATTEMPT_HEADER, 1)),
+                    "last_error": (m.headers or {}).get(ERROR_HEADER),
+                    "body": m.body.decode("utf-8", errors="replace"),
+                }
+                for m in taken
+            ]
+        finally:
+            for message in taken:
+                await message.nack(requeue=True)
+
+    async def replay_dead_letters(self, limit: int = 50) -> int:
+        # переотправляем в основную очередь с обнулённым счётчиком попыток
+        if self.retry_channel is None:
+            return 0
+        queue = await self.retry_channel.get_queue(self.dead_queue_name)
+        replayed = 0
+        while replayed < limit:
+            message = await queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            headers = {k: v for k, v in (message.headers or {}).items() if k not in (ATTEMPT_HEADER, ERROR_HEADER)}
+            await self.retry_channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    content_type=message.content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers=headers,
+                ),
+                routing_key=self.queue_name,
+            )
+            await message.ack()
+            replayed += 1
+        return replayed
+
+    def _ordering_key_of(self, message: aio_pika.abc.AbstractIncomingMessage) -> str | None:
+        if not self.ordering_key:
+            return None
+        try:
+            key = self.ordering_key(json.loads(message.body.decode("utf-8")))
+        except (ValueError, AttributeError):
+            return None
+        return None if key is None else str(key)
+
+    @asynccontextmanager
+    async def _key_lock(self, key: str):
+        # сообщения с одним ключом идут строго по одному. Считаем пользователей замка, а не
+        # смотрим locked(): сразу после release() разбуженный ожидающий ещё не взял замок,
+        # и удалить его в этот момент значит пустить следующее сообщение параллельно
+        entry = self._key_locks.get(key)
+        if entry is None:
+            entry = self._key_locks[key] = _KeyLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._key_locks[key]
 
     async def close(self):
+        # перестаём брать новые сообщения, дожидаемся уже взятых и только потом рвём соединение
+        self._stopping = True
+        if self._iterator is not None:
+            await self._iterator.close()
+        if self._consumer_tag is not None:
+            await self._batch_queue.cancel(self._consumer_tag)
+            self._buffer.put_nowait(None)
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
         if self.connection:
             await self.connection.close()
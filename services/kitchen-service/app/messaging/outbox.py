@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal, run_db
+from app.messaging.rabbit import RabbitPublisher
+from app.models.outbox_event import OutboxEvent
+
+logger = logging.getLogger("coffee")
+
+OUTBOX_PUBLISHED = Counter(
+    "outbox_events_published_total",
+    "Outbox events published to RabbitMQ and marked as sent",
+)
+
+OUTBOX_PUBLISH_FAILURES = Counter(
+    "outbox_relay_failures_total",
+    "Outbox relay batches that failed and will be retried",
+)
+
+OUTBOX_BATCH_SIZE = Histogram(
+    "outbox_relay_batch_size",
+    "Events published per relay batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500),
+)
+
+OUTBOX_BACKLOG = Gauge(
+    "outbox_backlog_events",
+    "Outbox events not yet published",
+)
+
+OUTBOX_OLDEST_AGE = Gauge(
+    "outbox_backlog_oldest_age_seconds",
+    "Age of the oldest unpublished outbox event (seconds)",
+)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)  # TIMESTAMP без TZ
+
+
+class OutboxRelay:
+    """Фоновая задача: вычитывает outbox_events пачками и публикует в RabbitMQ.
+
+    Ручки start/complete пишут событие в outbox в той же транзакции, что и статус,
+    и будят relay через notify(). Сессия синхронная, поэтому запросы идут через run_db.
+    """
+
+    def __init__(
+        self,
+        publisher: RabbitPublisher,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        retry_delay: float = 2.0,
+        retention: float = 7 * 86400,
+        purge_interval: float = 3600.0,
+    ):
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        # отправленные строки храним retention секунд (для разбора инцидентов), потом удаляем
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+
+    def notify(self) -> None:
+        # зовут из sync-ручек (пул потоков FastAPI), asyncio.Event не потокобезопасен
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self) -> None:
+        while not self._stopping:
+            try:
+                sent = await self.relay_batch()
+            except Exception:
+                logger.exception("KITCHEN outbox relay failed, retrying")
+                OUTBOX_PUBLISH_FAILURES.inc()
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            # полная пачка — скорее всего есть ещё, крутим без паузы
+            if sent >= self.batch_size:
+                continue
+
+            await run_db(self.update_backlog)
+            await self.maybe_purge()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def relay_batch(self) -> int:
+        # строки остаются заблокированы (SKIP LOCKED) до отметки sent_at — между
+        # шагами одна и та же сессия, просто шаги выполняются в потоках run_db
+        db: Session = SessionLocal()
+        try:
+            rows = await run_db(self.lock_batch, db)
+            if not rows:
+                return 0
+
+            # все публикации пачки в полёте одновременно, ждём подтверждения разом
+            await self.publisher.publish_many([(rk, payload) for _, rk, payload in rows])
+            await run_db(self.mark_sent, db, [outbox_id for outbox_id, _, _ in rows])
+        finally:
+            await run_db(db.close)
+
+        OUTBOX_PUBLISHED.inc(len(rows))
+        OUTBOX_BATCH_SIZE.observe(len(rows))
+        return len(rows)
+
+    async def maybe_purge(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        try:
+            purged = await run_db(self.purge_sent)
+        except Exception:
+            logger.exception("KITCHEN outbox purge failed")
+            return
+        if purged:
+            logger.info("KITCHEN outbox purged sent events count=%s", purged)
+
+    def purge_sent(self) -> int:
+        # sent_at пишет сам relay через utcnow(), поэтому и порог считаем так же
+        cutoff = utcnow() - timedelta(seconds=self.retention)
+        db: Session = SessionLocal()
+        try:
+            result = db.execute(delete(OutboxEvent).where(OutboxEvent.sent_at < cutoff))
+            db.commit()
+        finally:
+            db.close()
+        return result.rowcount
+
+    def lock_batch(self, db: Session) -> list:
+        return db.execute(
+            select(OutboxEvent.outbox_id, OutboxEvent.routing_key, OutboxEvent.payload)
+            .where(OutboxEvent.sent_at.is_(None))
+            .order_by(OutboxEvent.outbox_id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+    @staticmethod
+    def mark_sent(db: Session, outbox_ids: list[int]) -> None:
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.outbox_id.in_(outbox_ids))
+            .values(sent_at=utcnow())
+        )
+        db.commit()
+
+    @staticmethod
+    def update_backlog() -> None:
+        db: Session = SessionLocal()
+        try:
+            count, oldest = db.execute(
+                select(func.count(), func.min(OutboxEvent.created_at)).where(
+                    OutboxEvent.sent_at.is_(None)
+                )
+            ).one()
+        finally:
+            db.close()
+        OUTBOX_BACKLOG.set(count)
+        OUTBOX_OLDEST_AGE.set((utcnow() - oldest).total_seconds() if oldest else 0)
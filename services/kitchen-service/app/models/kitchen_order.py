@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, JSON
+from sqlalchemy import String, DateTime, JSON, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column
@@ -11,6 +11,15 @@ from app.db.base import Base
 
 class KitchenOrder(Base):
     __tablename__ = "kitchen_orders"
+    __table_args__ = (
+        # очередь читает только активные тикеты: готовые заказы в индекс не попадают.
+        # (из status IN ('NEW', 'IN_PROGRESS') в запросе планировщик это условие выводит)
+        Index(
+            "ix_kitchen_orders_active_created",
+            "created_at",
+            postgresql_where=text("status <> 'DONE'"),
+        ),
+    )
 
     kitchen_order_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
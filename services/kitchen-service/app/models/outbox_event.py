@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, String, DateTime, JSON, Index, text
+from sqlalchemy.sql import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    # монотонный id = порядок публикации
+    outbox_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+
+    routing_key: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # relay читает только неотправленные
+        Index(
+            "ix_outbox_events_unsent",
+            "outbox_id",
+            postgresql_where=text("sent_at IS NULL"),
+        ),
+    )
@@ -1,6 +1,8 @@
 from uuid import UUID
 from datetime import datetime
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field
 
 
 class KitchenOrderOut(BaseModel):
@@ -22,4 +24,18 @@ class KitchenQueueItemOut(BaseModel):
     items: dict  # мы храним JSON, ок
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class KitchenTransitionRequest(BaseModel):
+    action: Literal["start", "complete"]
+    order_ids: list[UUID] = Field(min_length=1, max_length=100)
+
+
+class KitchenTransitionResult(BaseModel):
+    order_id: UUID
+    ok: bool
+    # not_found / already_completed — если ok=False
+    error: str | None = None
+    status: str | None = None
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
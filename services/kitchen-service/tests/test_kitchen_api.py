@@ -0,0 +1,45 @@
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.kitchen import router
+from app.db.session import SessionLocal
+from app.models.kitchen_order import KitchenOrder
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def add_orders(*statuses: str) -> list[uuid.UUID]:
+    ids = [uuid.uuid4() for _ in statuses]
+    with SessionLocal() as db:
+        db.add_all(
+            KitchenOrder(order_id=order_id, status=status, items={"items": []})
+            for order_id, status in zip(ids, statuses)
+        )
+        db.commit()
+    return ids
+
+
+def statuses_of(response) -> dict[str, str]:
+    assert response.status_code == 200
+    return {t["order_id"]: t["status"] for t in response.json()}
+
+
+def test_ids_lookup_applies_status_filter(db_tables):
+    new, done = add_orders("NEW", "DONE")
+    params = [("ids", str(new)), ("ids", str(done))]
+
+    assert statuses_of(client.get("/orders", params=params + [("status", "DONE")])) == {str(done): "DONE"}
+    assert statuses_of(client.get("/orders", params=params + [("status", "NEW"), ("status", "IN_PROGRESS")])) == {
+        str(new): "NEW"
+    }
+
+
+def test_ids_lookup_without_status_returns_any_status(db_tables):
+    new, done = add_orders("NEW", "DONE")
+    params = [("ids", str(new)), ("ids", str(done))]
+
+    assert statuses_of(client.get("/orders", params=params)) == {str(new): "NEW", str(done): "DONE"}
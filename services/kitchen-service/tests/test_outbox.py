@@ -0,0 +1,46 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.messaging.outbox import OutboxRelay, utcnow
+from app.models.outbox_event import OutboxEvent
+
+
+def test_purge_sent_removes_only_old_sent_events(db_tables):
+    now = utcnow()
+    with SessionLocal() as db:
+        db.add_all(
+            [
+                OutboxEvent(routing_key="kitchen.completed", payload={"n": "old"}, sent_at=now - timedelta(days=8)),
+                OutboxEvent(routing_key="kitchen.completed", payload={"n": "recent"}, sent_at=now - timedelta(hours=1)),
+                OutboxEvent(routing_key="kitchen.completed", payload={"n": "unsent"}, sent_at=None),
+            ]
+        )
+        db.commit()
+
+    purged = OutboxRelay(publisher=None, retention=7 * 86400).purge_sent()
+
+    with SessionLocal() as db:
+        left = sorted(p["n"] for p in db.scalars(select(OutboxEvent.payload)))
+    assert purged == 1
+    assert left == ["recent", "unsent"]
+
+
+def test_maybe_purge_runs_once_per_interval():
+    relay = OutboxRelay(publisher=None, purge_interval=3600)
+    calls = []
+
+    def fake_purge():
+        calls.append(1)
+        return 0
+
+    relay.purge_sent = fake_purge
+
+    async def scenario():
+        await relay.maybe_purge()
+        await relay.maybe_purge()
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
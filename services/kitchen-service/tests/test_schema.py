@@ -0,0 +1,36 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.db.base import Base
+from app.db.schema import ensure_indexes
+from app.db.session import engine
+from app.models.kitchen_order import KitchenOrder
+
+
+def index_names(conn, table: str) -> set[str]:
+    return {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def test_ensure_indexes_adds_active_queue_index_to_existing_table(db_tables):
+    with engine.begin() as conn:
+        # таблица из старой схемы: частичного индекса очереди ещё нет
+        conn.execute(text("DROP INDEX ix_kitchen_orders_active_created"))
+        before = index_names(conn, "kitchen_orders")
+
+        ensure_indexes(conn, Base.metadata)
+        # второй прогон на актуальной схеме ничего не делает и не падает
+        ensure_indexes(conn, Base.metadata)
+        after = index_names(conn, "kitchen_orders")
+
+    assert "ix_kitchen_orders_active_created" not in before
+    assert "ix_kitchen_orders_active_created" in after
+
+
+def test_active_queue_index_is_partial_in_postgres():
+    (index,) = [ix for ix in KitchenOrder.__table__.indexes if ix.name == "ix_kitchen_orders_active_created"]
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))
+    assert ddl == (
+        "CREATE INDEX IF NOT EXISTS ix_kitchen_orders_active_created "
+        "ON kitchen_orders (created_at) WHERE status <> 'DONE'"
+    )
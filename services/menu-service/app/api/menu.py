@@ -1,16 +1,43 @@
 from uuid import UUID
 from fastapi import HTTPException
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from app.db.session import get_db
 from app.models.menu_item import MenuItem
-from app.schemas.menu import MenuItemOut, MenuItemCreate
+from app.models.recipe_item import RecipeItem
+from app.models.menu_version import MenuVersion
+from app.schemas.menu import MenuItemOut, MenuItemCreate, MenuItemBatchRequest, MenuItemBatchOut
 
 router = APIRouter(tags=["menu"])
 
 
+def bump_menu_version(db: Session) -> int:
+    # в той же транзакции, что и само изменение меню
+    return db.execute(
+        update(MenuVersion)
+        .where(MenuVersion.id == 1)
+        .values(version=MenuVersion.version + 1)
+        .returning(MenuVersion.version)
+    ).scalar_one()
+
+
+def publish_menu_changed(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    version: int,
+    menu_item_ids: list[UUID],
+) -> None:
+    # публикуем после ответа клиенту; order-service сбросит кэш по этим позициям
+    event = {
+        "event_type": "MenuChanged",
+        "version": version,
+        "menu_item_ids": [str(i) for i in menu_item_ids],
+    }
+    background_tasks.add_task(request.app.state.publisher.publish, "menu.changed", event)
+
+
 @router.get("/items", response_model=list[MenuItemOut])
 def list_menu_items(db: Session = Depends(get_db), active_only: bool = True):
     stmt = select(MenuItem)
@@ -23,7 +50,12 @@ def list_menu_items(db: Session = Depends(get_db), active_only: bool = True):
 
 # маленький эндпоинт наполнения меню
 @router.post("/items", response_model=MenuItemOut, status_code=201)
-def create_menu_item(payload: MenuItemCreate, db: Session = Depends(get_db)):
+def create_menu_item(
+    payload: MenuItemCreate,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     item = MenuItem(
         name=payload.name,
         description=payload.description,
@@ -33,11 +65,41 @@ def create_menu_item(payload: MenuItemCreate, db: Session = Depends(get_db)):
         is_active=payload.is_active,
     )
     db.add(item)
+    db.flush()
+    version = bump_menu_version(db)
     db.commit()
     db.refresh(item)
+
+    publish_menu_changed(request, background_tasks, version, [item.menu_item_id])
     return item
 
 
+# пакетная выборка для order-service: цены, флаги активности и рецепты
+# за один запрос, по одному SELECT на таблицу
+@router.post("/items:batch", response_model=list[MenuItemBatchOut])
+def get_menu_items_batch(payload: MenuItemBatchRequest, db: Session = Depends(get_db)):
+    ids = list(dict.fromkeys(payload.menu_item_ids))
+
+    items = db.scalars(select(MenuItem).where(MenuItem.menu_item_id.in_(ids))).all()
+
+    recipes: dict[UUID, list[RecipeItem]] = {i.menu_item_id: [] for i in items}
+    if recipes:
+        rows = db.scalars(select(RecipeItem).where(RecipeItem.menu_item_id.in_(list(recipes)))).all()
+        for r in rows:
+            recipes[r.menu_item_id].append(r)
+
+    return [
+        MenuItemBatchOut(
+            menu_item_id=i.menu_item_id,
+            name=i.name,
+            price=i.price,
+            is_active=i.is_active,
+            recipe=recipes[i.menu_item_id],
+        )
+        for i in items
+    ]
+
+
 @router.get("/items/{menu_item_id}", response_model=MenuItemOut)
 def get_menu_item(
     menu_item_id: UUID,
@@ -1,9 +1,10 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
+from app.api.menu import bump_menu_version, publish_menu_changed
 from app.db.session import get_db
 from app.models.menu_item import MenuItem
 from app.models.recipe_item import RecipeItem
@@ -24,7 +25,13 @@ def get_recipe(menu_item_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.put("/items/{menu_item_id}/recipe", response_model=list[RecipeItemOut])
-def set_recipe(menu_item_id: UUID, payload: list[RecipeItemIn], db: Session = Depends(get_db)):
+def set_recipe(
+    menu_item_id: UUID,
+    payload: list[RecipeItemIn],
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     item = db.scalar(select(MenuItem).where(MenuItem.menu_item_id == menu_item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Menu item not found")
@@ -40,7 +47,10 @@ def set_recipe(menu_item_id: UUID, payload: list[RecipeItemIn], db: Session = De
             )
         )
 
+    version = bump_menu_version(db)
     db.commit()
 
+    publish_menu_changed(request, background_tasks, version, [menu_item_id])
+
     rows = db.scalars(select(RecipeItem).where(RecipeItem.menu_item_id == menu_item_id)).all()
     return rows
@@ -4,6 +4,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     service_name: str = "menu-service"
     database_url: str
+    rabbitmq_url: str
 
     model_config = SettingsConfigDict(env_file=None, extra="ignore")
 
@@ -1,10 +1,12 @@
 from fastapi import FastAPI
 
 from app.core.settings import settings
-from app.db.session import ping_db, engine
+from app.db.session import ping_db, engine, SessionLocal
 from app.db.base import Base
 from app.models import menu_item as _menu_item  # noqa: F401
 from app.models import recipe_item as _recipe_item  # noqa: F401
+from app.models.menu_version import MenuVersion
+from app.messaging.rabbit import RabbitPublisher
 
 
 from app.api.menu import router as menu_router
@@ -19,10 +21,26 @@ app.include_router(menu_router)
 
 
 
+def ensure_menu_version() -> None:
+    with SessionLocal() as db:
+        if db.get(MenuVersion, 1) is None:
+            db.add(MenuVersion(id=1, version=0))
+            db.commit()
+
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     ping_db()
     Base.metadata.create_all(bind=engine)
+    ensure_menu_version()
+
+    app.state.publisher = RabbitPublisher(settings.rabbitmq_url)
+    await app.state.publisher.connect()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await app.state.publisher.close()
 
 
 @app.get("/health")
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field, field_validator
 from uuid import UUID
 
+from app.schemas.recipe import RecipeItemOut
+
 ALLOWED_CATEGORIES = {"Coffee", "Tea", "Food", "Dessert", "Other"}
 
 
@@ -36,3 +38,15 @@ class MenuItemCreate(BaseModel):
             raise ValueError(f"Invalid category. Allowed: {sorted(ALLOWED_CATEGORIES)}")
         return v_norm
 
+
+
+class MenuItemBatchRequest(BaseModel):
+    menu_item_ids: list[UUID] = Field(min_length=1, max_length=500)
+
+
+class MenuItemBatchOut(BaseModel):
+    menu_item_id: UUID
+    name: str
+    price: float
+    is_active: bool
+    recipe: list[RecipeItemOut]
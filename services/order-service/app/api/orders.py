@@ -1,56 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal
 from collections import defaultdict
 
 from app.db.session import get_db
 from app.models.order import Order
 from app.models.order_item import OrderItem
-from app.schemas.orders import OrderCreate, OrderOut
+from app.models.outbox_event import OutboxEvent
+from app.models.order_history import OrderHistory
+from app.schemas.orders import OrderCreate, OrderOut, OrderSummaryOut, OrderBatchCreate, OrderBatchResult
 from app.integrations.menu_client import MenuClient
+from app.integrations.menu_cache import MenuCache
+from app.core.settings import settings
 
 from app.core.auth import get_current_user, CurrentUser
-from app.metrics import ORDERS_CREATED
+from app.core.idempotency import IdempotencyStore, request_hash
+from app.core.pagination import decode_cursor, encode_cursor
+from app.metrics import ORDERS_CREATED, IDEMPOTENT_REPLAYS
 
 
 
 
+import uuid
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import literal, select, tuple_
 from sqlalchemy.orm import selectinload
 
 router = APIRouter(tags=["orders"])
 menu_client = MenuClient()
+menu_cache = MenuCache(
+    menu_client,
+    max_items=settings.menu_cache_max_items,
+    ttl=settings.menu_cache_ttl,
+    stale_grace=settings.menu_cache_stale_grace,
+)
+idempotency = IdempotencyStore(
+    max_items=settings.idempotency_cache_max_items,
+    ttl=settings.idempotency_ttl,
+)
 
 from fastapi import Request
 
-@router.post("/orders", response_model=OrderOut, status_code=201)
-async def create_order(payload: OrderCreate, request: Request, db: Session = Depends(get_db),current_user: CurrentUser = Depends(get_current_user)):
-    if not payload.items:
-        raise HTTPException(status_code=400, detail="Order must contain at least one item")
-
+def price_items(payload: OrderCreate, menu_items: dict[str, dict]) -> tuple[Decimal, list[OrderItem], dict[str, int]]:
     total = Decimal("0.00")
     items_to_save: list[OrderItem] = []
     ingredients_totals: dict[str, int] = defaultdict(int)
 
-
     for it in payload.items:
-        try:
-            menu_item = await menu_client.get_item(it.menu_item_id)
-            
-        except ValueError:
+        menu_item = menu_items.get(str(it.menu_item_id))
+        if not menu_item or not menu_item["is_active"]:
             raise HTTPException(status_code=404, detail=f"Menu item not found: {it.menu_item_id}")
-        except Exception:
-            raise HTTPException(status_code=502, detail="Menu service unavailable")
-        
-        try:
-            recipe = await menu_client.get_recipe(it.menu_item_id)
-        except ValueError:
-            recipe = []  # нет рецепта — списаний не будет
-        except Exception:
-            raise HTTPException(status_code=502, detail="Menu service unavailable")
-        
-        for r in recipe:
+
+        # пустой рецепт — списаний не будет
+        for r in menu_item["recipe"]:
             ing_id = str(r["ingredient_id"])
             per_one_qty = int(r["quantity"])
             ingredients_totals[ing_id] += per_one_qty * it.quantity
@@ -62,100 +66,262 @@ async def create_order(payload: OrderCreate, request: Request, db: Session = Dep
             OrderItem(menu_item_id=it.menu_item_id, quantity=it.quantity, unit_price=unit_price)
         )
 
+    return total, items_to_save, ingredients_totals
+
+
+def order_created_event(order: Order, ingredients_totals: dict[str, int]) -> dict:
+    return {
+        "event_type": "OrderCreated",
+        "order_id": str(order.order_id),
+        "customer_id": str(order.customer_id) if order.customer_id else None,
+        "channel": order.channel,
+        "status": order.status,
+        "total_price": float(order.total_price),
+        "items": [
+            {
+                "menu_item_id": str(i.menu_item_id),
+                "quantity": i.quantity,
+                "unit_price": float(i.unit_price),
+            }
+            for i in order.items
+        ],
+        "ingredients": [
+            {"ingredient_id": ing_id, "quantity": qty}
+            for ing_id, qty in ingredients_totals.items()
+        ],
+    }
+
+
+def order_history_row(order: Order, event: dict) -> OrderHistory:
+    return OrderHistory(
+        order_id=order.order_id,
+        customer_id=order.customer_id,
+        status=order.status,
+        channel=order.channel,
+        total_price=order.total_price,
+        items=event["items"],
+        kitchen_status="NEW",
+    )
+
+
+@router.post("/orders", response_model=OrderOut, status_code=201)
+async def create_order(
+    payload: OrderCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    idempotency_key: str | None = Header(default=None, max_length=255),
+):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="Order must contain at least one item")
+
+    # повтор запроса с тем же Idempotency-Key — отдаём сохранённый ответ
+    req_hash = request_hash(payload)
+    if idempotency_key:
+        stored = await idempotency.lookup(db, current_user.user_id, idempotency_key, req_hash)
+        if stored is not None:
+            IDEMPOTENT_REPLAYS.inc()
+            return JSONResponse(status_code=201, content=stored)
+
+    try:
+        menu_items = await menu_cache.get_items([it.menu_item_id for it in payload.items])
+    except Exception:
+        raise HTTPException(status_code=502, detail="Menu service unavailable")
+
+    total, items_to_save, ingredients_totals = price_items(payload, menu_items)
+
     order = Order(
     customer_id=current_user.user_id,
     channel=payload.channel,
     status="PAID",
     total_price=total,
+    items=items_to_save,
     )
     db.add(order)
-    db.flush()  # получаем order_id
+    await db.flush()  # получаем order_id
+
+    event = order_created_event(order, ingredients_totals)
+
+    # событие уходит в outbox в той же транзакции, публикует его OutboxRelay
+    db.add(OutboxEvent(routing_key="order.created", payload=event))
+    db.add(order_history_row(order, event))
+
+    response = OrderOut.model_validate(order).model_dump(mode="json")
+    if idempotency_key:
+        idempotency.record(db, current_user.user_id, idempotency_key, req_hash, order.order_id, response)
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # параллельный дубль успел закоммитить тот же ключ раньше нас
+        await db.rollback()
+        stored = None
+        if idempotency_key:
+            stored = await idempotency.lookup(db, current_user.user_id, idempotency_key, req_hash)
+        if stored is None:
+            raise
+        IDEMPOTENT_REPLAYS.inc()
+        return JSONResponse(status_code=201, content=stored)
+
+    if idempotency_key:
+        idempotency.remember(current_user.user_id, idempotency_key, req_hash, response)
 
-    for oi in items_to_save:
-        oi.order_id = order.order_id
-        db.add(oi)
+    ORDERS_CREATED.labels(channel=order.channel).inc()
+    request.app.state.outbox_relay.notify()
 
-    db.commit()
-    db.refresh(order)
+    return response
 
-    ORDERS_CREATED.labels(channel=order.channel).inc()
 
 
-    event = {
-    "event_type": "OrderCreated",
-    "order_id": str(order.order_id),
-    "customer_id": str(order.customer_id) if order.customer_id else None,
-    "channel": order.channel,
-    "status": order.status,
-    "total_price": float(order.total_price),
-    "items": [
-        {
-            "menu_item_id": str(i.menu_item_id),
-            "quantity": i.quantity,
-            "unit_price": float(i.unit_price),
-        }
-        for i in order.items
-    ],
-    "ingredients" : [ 
-        {
-        "ingredient_id": ing_id, 
-        "quantity": qty
-        }
-        for ing_id, qty in ingredients_totals.items()
-    ]
+@router.post("/orders:batch", response_model=list[OrderBatchResult])
+async def create_orders_batch(
+    payload: OrderBatchCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    # досылка офлайн-очереди POS: одно обращение к меню, одна транзакция,
+    # события уходят через outbox и публикуются relay одной пачкой с confirms
+    results: list[OrderBatchResult | None] = [None] * len(payload.orders)
+
+    hashes = [request_hash(OrderCreate(channel=e.channel, items=e.items)) for e in payload.orders]
+    keys = [e.idempotency_key for e in payload.orders if e.idempotency_key]
+    stored = await idempotency.lookup_many(db, current_user.user_id, keys) if keys else {}
+
+    try:
+        menu_items = await menu_cache.get_items([it.menu_item_id for e in payload.orders for it in e.items])
+    except Exception:
+        raise HTTPException(status_code=502, detail="Menu service unavailable")
+
+    created: list[tuple[int, Order, dict]] = []
+    seen_keys: dict[str, int] = {}
+    duplicates: list[tuple[int, int]] = []
+    for idx, entry in enumerate(payload.orders):
+        key = entry.idempotency_key
+        if key and key in stored:
+            if stored[key].request_hash != hashes[idx]:
+                results[idx] = OrderBatchResult(index=idx, status="FAILED", error="Idempotency-Key reused with a different request body")
+            else:
+                IDEMPOTENT_REPLAYS.inc()
+                results[idx] = OrderBatchResult(index=idx, status="REPLAYED", order=stored[key].response)
+            continue
+        if key and key in seen_keys:
+            # тот же заказ дважды в одной пачке — ответим результатом первого
+            first = seen_keys[key]
+            if hashes[first] != hashes[idx]:
+                results[idx] = OrderBatchResult(index=idx, status="FAILED", error="Idempotency-Key reused with a different request body")
+            else:
+                duplicates.append((idx, first))
+            continue
+
+        if not entry.items:
+            results[idx] = OrderBatchResult(index=idx, status="FAILED", error="Order must contain at least one item")
+            continue
+        try:
+            total, items_to_save, ingredients_totals = price_items(entry, menu_items)
+        except HTTPException as e:
+            results[idx] = OrderBatchResult(index=idx, status="FAILED", error=e.detail)
+            continue
+
+        order = Order(
+            order_id=uuid.uuid4(),
+            customer_id=current_user.user_id,
+            channel=entry.channel,
+            status="PAID",
+            total_price=total,
+            items=items_to_save,
+        )
+        event = order_created_event(order, ingredients_totals)
+        response = OrderOut.model_validate(order).model_dump(mode="json")
+        created.append((idx, order, response))
+
+        db.add(order)
+        db.add(OutboxEvent(routing_key="order.created", payload=event))
+        db.add(order_history_row(order, event))
+        if key:
+            seen_keys[key] = idx
+            idempotency.record(db, current_user.user_id, key, hashes[idx], order.order_id, response)
+
+    if created:
+        # SQLAlchemy 2.0 сливает flush однотипных строк в multi-row INSERT (insertmanyvalues)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Concurrent request with the same idempotency keys, retry the batch")
 
-    }
+    for idx, order, response in created:
+        key = payload.orders[idx].idempotency_key
+        if key:
+            idempotency.remember(current_user.user_id, key, hashes[idx], response)
+        ORDERS_CREATED.labels(channel=order.channel).inc()
+        results[idx] = OrderBatchResult(index=idx, status="CREATED", order=response)
 
-    print("ORDER publish order.created:", event["order_id"]) #проверка до
-    await request.app.state.publisher.publish("order.created", event)
-    print("ORDER published OK:", event["order_id"]) # проверка после
+    for idx, first in duplicates:
+        IDEMPOTENT_REPLAYS.inc()
+        results[idx] = OrderBatchResult(index=idx, status="REPLAYED", order=results[first].order)
 
-    return order
+    if created:
+        request.app.state.outbox_relay.notify()
 
+    return results
 
 
 @router.get("/orders/me", response_model=list[OrderOut])
-def my_orders(
-    db: Session = Depends(get_db),
+async def my_orders(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
 ):
     stmt = (
         select(Order)
         .where(Order.customer_id == current_user.user_id)
         .options(selectinload(Order.items))
-        .order_by(Order.created_at.desc() if hasattr(Order, "created_at") else Order.order_id.desc())
-        .limit(50)
     )
-    orders = db.execute(stmt).scalars().all()
-    return orders
+    return await fetch_page(db, stmt, Order, response, cursor, limit)
 
 
+@router.get("/orders/me/summary", response_model=list[OrderSummaryOut])
+async def my_orders_summary(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=200),
+):
+    # история с кухонным статусом одним индексным запросом вместо 1 + N обращений к kitchen-service
+    stmt = select(OrderHistory).where(OrderHistory.customer_id == current_user.user_id)
+    return await fetch_page(db, stmt, OrderHistory, response, cursor, limit)
 
 
 @router.get("/orders/{order_id}", response_model=OrderOut)
-def get_order(order_id: UUID, db: Session = Depends(get_db)):
+async def get_order(order_id: UUID, db: AsyncSession = Depends(get_db)):
     stmt = (
         select(Order)
         .where(Order.order_id == order_id)
         .options(selectinload(Order.items))
     )
-    order = db.scalar(stmt)
+    order = await db.scalar(stmt)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 
 @router.get("/orders", response_model=list[OrderOut])
-def list_orders(
-    db: Session = Depends(get_db),
+async def list_orders(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     customer_id: UUID | None = None,
     include_guest: bool = True,
+    cursor: str | None = None,
     limit: int = 50,
 ):
     if limit < 1 or limit > 200:
         raise HTTPException(status_code=400, detail="limit must be between 1 and 200")
 
-    stmt = select(Order).options(selectinload(Order.items)).order_by(Order.created_at.desc())
+    stmt = select(Order).options(selectinload(Order.items))
 
     if customer_id is not None:
         stmt = stmt.where(Order.customer_id == customer_id)
@@ -164,7 +330,24 @@ def list_orders(
         if not include_guest:
             stmt = stmt.where(Order.customer_id.is_not(None))
 
-    orders = db.scalars(stmt.limit(limit)).all()
-    return orders
+    return await fetch_page(db, stmt, Order, response, cursor, limit)
+
+
+async def fetch_page(db: AsyncSession, stmt, model, response: Response, cursor: str | None, limit: int) -> list:
+    # keyset по (created_at, order_id) DESC: страница 1000 стоит как страница 1.
+    # курсор следующей страницы — в заголовке X-Next-Cursor
+    if cursor:
+        created_at, order_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(model.created_at, model.order_id)
+            < tuple_(literal(created_at, model.created_at.type), literal(order_id, model.order_id.type))
+        )
 
+    stmt = stmt.order_by(model.created_at.desc(), model.order_id.desc()).limit(limit + 1)
+    rows = (await db.scalars(stmt)).all()
 
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.order_id)
+    return rows
@@ -0,0 +1,143 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from uuid import UUID
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.idempotency_key import IdempotencyKey
+
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    response: dict
+    stored_at: float
+
+
+def request_hash(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Idempotency-Key для POST /orders: LRU в памяти перед таблицей idempotency_keys.
+
+    Повтор с тем же ключом отдаёт сохранённый ответ, не трогая menu-service и outbox.
+    """
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple[UUID, str], StoredResponse] = OrderedDict()
+
+    def expired(self):
+        # срок считаем в БД: created_at пишется её now(), часы и таймзона Python не участвуют
+        return IdempotencyKey.created_at < func.now() - timedelta(seconds=self.ttl)
+
+    async def lookup(self, db: AsyncSession, customer_id: UUID, key: str, req_hash: str) -> dict | None:
+        now = time.monotonic()
+        entry = self.entries.get((customer_id, key))
+        if entry and now - entry.stored_at < self.ttl:
+            self.entries.move_to_end((customer_id, key))
+            return self._check(entry, req_hash)
+
+        found = (
+            await db.execute(
+                select(IdempotencyKey, self.expired()).where(
+                    IdempotencyKey.customer_id == customer_id,
+                    IdempotencyKey.key == key,
+                )
+            )
+        ).first()
+        if not found:
+            return None
+
+        row, expired = found
+        if expired:
+            # ключ протух — освобождаем его под новый запрос
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.idempotency_id == row.idempotency_id))
+            await db.commit()
+            return None
+
+        entry = StoredResponse(request_hash=row.request_hash, response=row.response, stored_at=now)
+        self._put(customer_id, key, entry)
+        return self._check(entry, req_hash)
+
+    async def lookup_many(self, db: AsyncSession, customer_id: UUID, keys: list[str]) -> dict[str, StoredResponse]:
+        # для пакетной загрузки: память + один SELECT ... IN по остальным ключам
+        now = time.monotonic()
+        found: dict[str, StoredResponse] = {}
+        missing: list[str] = []
+        for key in dict.fromkeys(keys):
+            entry = self.entries.get((customer_id, key))
+            if entry and now - entry.stored_at < self.ttl:
+                found[key] = entry
+            else:
+                missing.append(key)
+
+        if missing:
+            rows = (
+                await db.execute(
+                    select(IdempotencyKey, self.expired()).where(
+                        IdempotencyKey.customer_id == customer_id,
+                        IdempotencyKey.key.in_(missing),
+                    )
+                )
+            ).all()
+            expired = [row.idempotency_id for row, is_expired in rows if is_expired]
+            if expired:
+                await db.execute(delete(IdempotencyKey).where(IdempotencyKey.idempotency_id.in_(expired)))
+                await db.commit()
+            for row, is_expired in rows:
+                if is_expired:
+                    continue
+                entry = StoredResponse(request_hash=row.request_hash, response=row.response, stored_at=now)
+                self._put(customer_id, row.key, entry)
+                found[row.key] = entry
+
+        return found
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        # протухшие ключи, которые больше никто не спросил, — иначе таблица растёт вечно
+        result = await db.execute(delete(IdempotencyKey).where(self.expired()))
+        await db.commit()
+        return result.rowcount
+
+    def record(
+        self,
+        db: AsyncSession,
+        customer_id: UUID,
+        key: str,
+        req_hash: str,
+        order_id: UUID,
+        response: dict,
+    ) -> None:
+        # пишется в транзакции заказа; в память кладём после успешного commit
+        db.add(
+            IdempotencyKey(
+                customer_id=customer_id,
+                key=key,
+                request_hash=req_hash,
+                order_id=order_id,
+                response=response,
+            )
+        )
+
+    def remember(self, customer_id: UUID, key: str, req_hash: str, response: dict) -> None:
+        self._put(customer_id, key, StoredResponse(request_hash=req_hash, response=response, stored_at=time.monotonic()))
+
+    def _check(self, entry: StoredResponse, req_hash: str) -> dict:
+        if entry.request_hash != req_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request body")
+        return entry.response
+
+    def _put(self, customer_id: UUID, key: str, entry: StoredResponse) -> None:
+        self.entries[(customer_id, key)] = entry
+        self.entries.move_to_end((customer_id, key))
+        while len(self.entries) > self.max_items:
+            self.entries.popitem(last=False)
@@ -0,0 +1,14 @@
+import asyncio
+
+from app.metrics import EVENT_LOOP_LAG
+
+
+async def monitor_loop_lag(service: str, interval: float = 0.5) -> None:
+    # спим interval и смотрим, насколько позже нас разбудили:
+    # всё сверх interval — время, когда loop был занят чужим синхронным кодом
+    loop = asyncio.get_running_loop()
+    lag = EVENT_LOOP_LAG.labels(service=service)
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, loop.time() - start - interval))
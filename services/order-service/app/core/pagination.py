@@ -0,0 +1,23 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException
+
+# курсор для keyset-пагинации по (created_at DESC, order_id DESC):
+# непрозрачный base64url от последней строки страницы
+
+
+def encode_cursor(created_at: datetime, order_id: UUID) -> str:
+    raw = json.dumps({"c": created_at.isoformat(), "id": str(order_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["c"]), UUID(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
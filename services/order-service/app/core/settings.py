@@ -9,6 +9,50 @@ class Settings(BaseSettings):
     jwt_secret: str
     jwt_alg: str = "HS256"
 
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+
+    # HTTP-пул к menu-service
+    menu_http_max_connections: int = 50
+    menu_http_max_keepalive: int = 20
+    menu_http_keepalive_expiry: float = 30.0
+    menu_http2: bool = False
+    menu_http_connect_timeout: float = 1.0
+    menu_http_read_timeout: float = 3.0
+    menu_http_write_timeout: float = 3.0
+    menu_http_pool_timeout: float = 1.0
+
+    # кэш меню
+    menu_cache_max_items: int = 2000
+    menu_cache_ttl: float = 300.0
+    menu_cache_stale_grace: float = 120.0
+
+    # Idempotency-Key для POST /orders
+    idempotency_ttl: float = 86400.0
+    idempotency_cache_max_items: int = 10000
+    # как часто удалять из idempotency_keys ключи старше idempotency_ttl
+    idempotency_purge_interval: float = 3600.0
+
+    # публикация в RabbitMQ
+    rabbit_channel_pool_size: int = 4
+    rabbit_max_in_flight: int = 500
+    rabbit_unavailable_timeout: float = 30.0
+
+    # outbox relay
+    outbox_batch_size: int = 100
+    outbox_poll_interval: float = 1.0
+    # отправленные события удаляются из outbox_events через outbox_retention секунд
+    outbox_retention: float = 604800.0
+    outbox_purge_interval: float = 3600.0
+
+    # RabbitMQ consumer
+    consumer_prefetch: int = 32
+    consumer_concurrency: int = 16
+    # упавшее сообщение ретраится с паузой base * 2^(n-1) сек, после max_attempts — в <queue>.dead;
+    # TTL зашит в аргументы очередей <queue>.retry.N: после изменения их нужно пересоздать
+    consumer_max_attempts: int = 5
+    consumer_retry_base_delay: float = 1.0
+
 
     model_config = SettingsConfigDict(env_file=None, extra="ignore")
 
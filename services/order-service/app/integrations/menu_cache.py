@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID
+
+from app.integrations.menu_client import MenuClient
+from app.metrics import MENU_CACHE_EVICTIONS, MENU_CACHE_HITS, MENU_CACHE_MISSES, MENU_CACHE_STALE
+
+
+@dataclass
+class CacheEntry:
+    item: dict
+    version: int
+    fetched_at: float
+
+
+class MenuCache:
+    """LRU/TTL-кэш позиций меню (цена, is_active, рецепт) перед MenuClient.
+
+    Каждая запись помечена версией меню, известной на момент запроса.
+    Событие menu.changed поднимает версию и сбрасывает затронутые позиции.
+    Если menu-service недоступен, просроченные записи отдаются ещё
+    stale_grace секунд.
+    """
+
+    def __init__(self, client: MenuClient, max_items: int, ttl: float, stale_grace: float):
+        self.client = client
+        self.max_items = max_items
+        self.ttl = ttl
+        self.stale_grace = stale_grace
+
+        self.version = 0
+        # счётчик сбросов: версия из событий может прийти не по порядку и не вырасти
+        self.invalidations = 0
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    async def get_items(self, menu_item_ids: list[UUID]) -> dict[str, dict]:
+        now = time.monotonic()
+        result: dict[str, dict] = {}
+        missing: list[str] = []
+
+        for key in dict.fromkeys(str(i) for i in menu_item_ids):
+            entry = self.entries.get(key)
+            if entry and now - entry.fetched_at < self.ttl:
+                self.entries.move_to_end(key)
+                result[key] = entry.item
+                MENU_CACHE_HITS.inc()
+            else:
+                missing.append(key)
+                MENU_CACHE_MISSES.inc()
+
+        if not missing:
+            return result
+
+        version = self.version
+        invalidations = self.invalidations
+        try:
+            fetched = await self.client.get_items(missing)
+        except Exception:
+            # menu-service лежит: отдаём просроченное в пределах grace-окна
+            for key in missing:
+                entry = self.entries.get(key)
+                if not entry or now - entry.fetched_at >= self.ttl + self.stale_grace:
+                    raise
+                result[key] = entry.item
+                MENU_CACHE_STALE.inc()
+            return result
+
+        for key, item in fetched.items():
+            result[key] = item
+            # пока шёл запрос, меню могло поменяться — такой ответ не кэшируем
+            if self.invalidations == invalidations:
+                self._put(key, item, version)
+
+        return result
+
+    def invalidate(self, version: int, menu_item_ids: list[str] | None = None) -> None:
+        # menu.changed публикуются из отдельных BackgroundTasks и приходят не по порядку:
+        # перечисленные позиции сбрасываем всегда, версия только растёт
+        self.version = max(self.version, version)
+        self.invalidations += 1
+
+        keys = list(self.entries) if not menu_item_ids else menu_item_ids
+        for key in keys:
+            if self.entries.pop(str(key), None) is not None:
+                MENU_CACHE_EVICTIONS.labels(reason="invalidated").inc()
+
+    def _put(self, key: str, item: dict, version: int) -> None:
+        self.entries[key] = CacheEntry(item=item, version=version, fetched_at=time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_items:
+            self.entries.popitem(last=False)
+            MENU_CACHE_EVICTIONS.labels(reason="lru").inc()
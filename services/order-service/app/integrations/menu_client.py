@@ -1,26 +1,81 @@
+import time
 from uuid import UUID
 import httpx
 
 from app.core.settings import settings
+from app.metrics import MENU_HTTP_IN_FLIGHT, MENU_HTTP_LATENCY, MENU_HTTP_POOL_MAX
+
+# /items:batch в menu-service принимает не больше 500 id за запрос
+BATCH_MAX_IDS = 500
 
 
 class MenuClient:
     def __init__(self):
         self.base_url = settings.menu_service_url.rstrip("/")
+        self.client: httpx.AsyncClient | None = None
+
+    async def connect(self) -> None:
+        # один долгоживущий клиент на процесс: пул соединений + keep-alive
+        limits = httpx.Limits(
+            max_connections=settings.menu_http_max_connections,
+            max_keepalive_connections=settings.menu_http_max_keepalive,
+            keepalive_expiry=settings.menu_http_keepalive_expiry,
+        )
+        timeout = httpx.Timeout(
+            connect=settings.menu_http_connect_timeout,
+            read=settings.menu_http_read_timeout,
+            write=settings.menu_http_write_timeout,
+            pool=settings.menu_http_pool_timeout,
+        )
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=limits,
+            timeout=timeout,
+            http2=settings.menu_http2,
+        )
+        MENU_HTTP_POOL_MAX.set(settings.menu_http_max_connections)
+
+    async def close(self) -> None:
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def _request(self, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        if not self.client:
+            raise RuntimeError("MenuClient not connected")
+
+        status = "error"
+        start = time.perf_counter()
+        MENU_HTTP_IN_FLIGHT.inc()
+        try:
+            r = await self.client.request(method, url, **kwargs)
+            status = str(r.status_code)
+            return r
+        finally:
+            MENU_HTTP_IN_FLIGHT.dec()
+            MENU_HTTP_LATENCY.labels(endpoint=endpoint, status=status).observe(time.perf_counter() - start)
 
     async def get_item(self, menu_item_id: UUID) -> dict:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            r = await client.get(f"{self.base_url}/items/{menu_item_id}")
-            if r.status_code == 404:
-                raise ValueError("Menu item not found")
-            r.raise_for_status()
-            return r.json()
-        
+        r = await self._request("get_item", "GET", f"/items/{menu_item_id}")
+        if r.status_code == 404:
+            raise ValueError("Menu item not found")
+        r.raise_for_status()
+        return r.json()
+
     async def get_recipe(self, menu_item_id: UUID) -> list[dict]:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            r = await client.get(f"{self.base_url}/items/{menu_item_id}/recipe")
-            if r.status_code == 404:
-                raise ValueError("Menu item recipe not found")
-            r.raise_for_status()
-            return r.json()
+        r = await self._request("get_recipe", "GET", f"/items/{menu_item_id}/recipe")
+        if r.status_code == 404:
+            raise ValueError("Menu item recipe not found")
+        r.raise_for_status()
+        return r.json()
 
+    async def get_items(self, menu_item_ids: list[UUID]) -> dict[str, dict]:
+        # цена, is_active и рецепт по каждой позиции; обычно заказ укладывается в один запрос
+        ids = [str(i) for i in dict.fromkeys(menu_item_ids)]
+        items: dict[str, dict] = {}
+        for start in range(0, len(ids), BATCH_MAX_IDS):
+            chunk = ids[start:start + BATCH_MAX_IDS]
+            r = await self._request("get_items", "POST", "/items:batch", json={"menu_item_ids": chunk})
+            r.raise_for_status()
+            items.update((str(item["menu_item_id"]), item) for item in r.json())
+        return items
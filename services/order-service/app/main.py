@@ -1,38 +1,221 @@
+import asyncio
+import logging
+from datetime import datetime
+from uuid import UUID
+
 from fastapi import FastAPI
+from sqlalchemy import exists, func, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.core.settings import settings
-from app.db.session import ping_db, engine
+from app.core.loop_lag import monitor_loop_lag
+from app.db.session import ping_db, engine, SessionLocal
+from app.models.order import Order
+from app.models.order_history import OrderHistory
+from app.models.order_item import OrderItem
 from app.db.base import Base
+from app.db.schema import ensure_indexes
 from app.models import order as _order  # noqa: F401
 from app.models import order_item as _order_item  # noqa: F401
+from app.models import outbox_event as _outbox_event  # noqa: F401
+from app.models import idempotency_key as _idempotency_key  # noqa: F401
+from app.models import order_history as _order_history  # noqa: F401
 from app.messaging.rabbit import RabbitPublisher
+from app.messaging.consumer import RabbitConsumer
+from app.messaging.outbox import OutboxRelay
 
 
 
 
 
-from app.api.orders import router as orders_router
+from app.api.orders import router as orders_router, menu_client, menu_cache, idempotency
 
 app = FastAPI(title=settings.service_name)
 
 app.include_router(orders_router)
 
+logger = logging.getLogger("coffee")
+logging.basicConfig(level=logging.INFO)
+
+# сброс кэша меню: у каждого экземпляра своя временная очередь
+menu_consumer = RabbitConsumer(
+    amqp_url=settings.rabbitmq_url,
+    queue_name="",
+    routing_key="menu.changed",
+    exclusive=True,
+)
+
+
+async def handle_menu_changed(payload: dict):
+    version = int(payload.get("version", 0))
+    ids = payload.get("menu_item_ids") or []
+    menu_cache.invalidate(version, ids)
+    logger.info("ORDER menu cache invalidated version=%s items=%s", version, len(ids))
+
+
+# статусы кухни -> проекция order_history
+kitchen_consumer = RabbitConsumer(
+    amqp_url=settings.rabbitmq_url,
+    queue_name="order.kitchen.status",
+    routing_key="kitchen.*",
+    prefetch=settings.consumer_prefetch,
+    concurrency=settings.consumer_concurrency,
+    max_attempts=settings.consumer_max_attempts,
+    retry_base_delay=settings.consumer_retry_base_delay,
+    # started/completed одного заказа применяем по порядку
+    ordering_key=lambda p: p.get("order_id"),
+)
+
+
+def parse_ts(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+async def handle_kitchen_status(payload: dict):
+    order_id = payload.get("order_id")
+    status = payload.get("status")
+    if not order_id or not status:
+        logger.warning("ORDER kitchen event without order_id/status: %s", payload)
+        return
 
+    started_at = parse_ts(payload.get("started_at"))
+    completed_at = parse_ts(payload.get("completed_at"))
 
+    stmt = (
+        update(OrderHistory)
+        .where(OrderHistory.order_id == UUID(str(order_id)))
+        .values(
+            kitchen_status=status,
+            started_at=func.coalesce(OrderHistory.started_at, started_at),
+            completed_at=func.coalesce(OrderHistory.completed_at, completed_at),
+        )
+    )
+    # события могут прийти не по порядку: DONE не откатываем назад
+    if status != "DONE":
+        stmt = stmt.where(OrderHistory.kitchen_status != "DONE")
+
+    async with SessionLocal() as db:
+        await db.execute(stmt)
+        await db.commit()
+    logger.info("ORDER history kitchen_status=%s order_id=%s", status, order_id)
+
+
+
+async def backfill_order_history() -> int:
+    """Дозаполняет order_history заказами, созданными до появления проекции.
+
+    Идемпотентно: берутся только заказы без строки в истории, так что после первого
+    прогона это пустой anti-join. Статус кухни у старых заказов неизвестен (он в БД
+    kitchen-service) — пишем UNKNOWN, событие kitchen.* его ещё может обновить.
+    """
+    items = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    # ключи — литералами: у json_build_object(VARIADIC "any") bind-параметр без типа не пройдёт
+                    func.json_build_object(
+                        literal_column("'menu_item_id'"), OrderItem.menu_item_id,
+                        literal_column("'quantity'"), OrderItem.quantity,
+                        literal_column("'unit_price'"), OrderItem.unit_price,
+                    )
+                ),
+                text("'[]'::json"),
+            )
+        )
+        .where(OrderItem.order_id == Order.order_id)
+        .scalar_subquery()
+    )
+    missing = select(
+        Order.order_id,
+        Order.customer_id,
+        Order.status,
+        Order.channel,
+        Order.total_price,
+        items,
+        literal_column("'UNKNOWN'"),
+        Order.created_at,
+        Order.updated_at,
+    ).where(~exists().where(OrderHistory.order_id == Order.order_id))
+
+    stmt = pg_insert(OrderHistory).from_select(
+        [
+            OrderHistory.order_id,
+            OrderHistory.customer_id,
+            OrderHistory.status,
+            OrderHistory.channel,
+            OrderHistory.total_price,
+            OrderHistory.items,
+            OrderHistory.kitchen_status,
+            OrderHistory.created_at,
+            OrderHistory.updated_at,
+        ],
+        missing,
+    )
+    async with SessionLocal() as db:
+        # параллельный старт второй реплики не должен падать на тех же order_id
+        result = await db.execute(stmt.on_conflict_do_nothing(index_elements=[OrderHistory.order_id]))
+        await db.commit()
+    return result.rowcount
+
+
+async def purge_idempotency_keys():
+    while True:
+        await asyncio.sleep(settings.idempotency_purge_interval)
+        try:
+            async with SessionLocal() as db:
+                purged = await idempotency.purge_expired(db)
+            if purged:
+                logger.info("ORDER purged expired idempotency keys count=%s", purged)
+        except Exception:
+            logger.exception("ORDER idempotency key purge failed")
 
 
 @app.on_event("startup")
 async def on_startup():
-    ping_db()
-    Base.metadata.create_all(bind=engine)
+    app.state.loop_lag = asyncio.create_task(monitor_loop_lag(settings.service_name))
+
+    await ping_db()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_indexes, Base.metadata)
 
-    app.state.publisher = RabbitPublisher(settings.rabbitmq_url)
+    backfilled = await backfill_order_history()
+    if backfilled:
+        logger.info("ORDER order_history backfilled orders=%s", backfilled)
+
+    app.state.publisher = RabbitPublisher(
+        settings.rabbitmq_url,
+        channel_pool_size=settings.rabbit_channel_pool_size,
+        max_in_flight=settings.rabbit_max_in_flight,
+        unavailable_timeout=settings.rabbit_unavailable_timeout,
+    )
     await app.state.publisher.connect()
 
+    app.state.outbox_relay = OutboxRelay(
+        app.state.publisher,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval,
+        retention=settings.outbox_retention,
+        purge_interval=settings.outbox_purge_interval,
+    )
+    app.state.outbox_relay.start()
+    app.state.idempotency_purge = asyncio.create_task(purge_idempotency_keys())
+
+    await menu_client.connect()
+    asyncio.create_task(menu_consumer.connect_and_consume(handle_menu_changed))
+    asyncio.create_task(kitchen_consumer.connect_and_consume(handle_kitchen_status))
+
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await menu_consumer.close()
+    await kitchen_consumer.close()
+    await menu_client.close()
+    app.state.idempotency_purge.cancel()
+    await app.state.outbox_relay.stop()
     await app.state.publisher.close()
+    await engine.dispose()
+    app.state.loop_lag.cancel()
 
 
 @app.get("/health")
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select, update
+
+from app.db.session import SessionLocal
+from app.messaging.rabbit import RabbitPublisher
+from app.metrics import (
+    OUTBOX_BACKLOG,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_OLDEST_AGE,
+    OUTBOX_PUBLISH_FAILURES,
+    OUTBOX_PUBLISHED,
+)
+from app.models.outbox_event import OutboxEvent
+
+logger = logging.getLogger("coffee")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)  # TIMESTAMP без TZ
+
+
+class OutboxRelay:
+    """Фоновая задача: вычитывает outbox_events пачками и публикует в RabbitMQ.
+
+    HTTP-путь только пишет строку в outbox в своей транзакции и будит relay
+    через notify(); сам брокер в latency заказа больше не участвует.
+    """
+
+    def __init__(
+        self,
+        publisher: RabbitPublisher,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        retry_delay: float = 2.0,
+        retention: float = 7 * 86400,
+        purge_interval: float = 3600.0,
+    ):
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        # отправленные строки храним retention секунд (для разбора инцидентов), потом удаляем
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        while not self._stopping:
+            try:
+                sent = await self.relay_batch()
+            except Exception:
+                logger.exception("ORDER outbox relay failed, retrying")
+                OUTBOX_PUBLISH_FAILURES.inc()
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            # полная пачка — скорее всего есть ещё, крутим без паузы
+            if sent >= self.batch_size:
+                continue
+
+            await self.update_backlog()
+            await self.maybe_purge()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def relay_batch(self) -> int:
+        async with SessionLocal() as db:
+            rows = (
+                await db.scalars(
+                    select(OutboxEvent)
+                    .where(OutboxEvent.sent_at.is_(None))
+                    .order_by(OutboxEvent.outbox_id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            if not rows:
+                return 0
+
+            # все публикации пачки в полёте одновременно, ждём подтверждения разом
+            await self.publisher.publish_many([(r.routing_key, r.payload) for r in rows])
+
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.outbox_id.in_([r.outbox_id for r in rows]))
+                .values(sent_at=utcnow())
+            )
+            await db.commit()
+
+        OUTBOX_PUBLISHED.inc(len(rows))
+        OUTBOX_BATCH_SIZE.observe(len(rows))
+        return len(rows)
+
+    async def maybe_purge(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        try:
+            purged = await self.purge_sent()
+        except Exception:
+            logger.exception("ORDER outbox purge failed")
+            return
+        if purged:
+            logger.info("ORDER outbox purged sent events count=%s", purged)
+
+    async def purge_sent(self) -> int:
+        # sent_at пишет сам relay через utcnow(), поэтому и порог считаем так же
+        cutoff = utcnow() - timedelta(seconds=self.retention)
+        async with SessionLocal() as db:
+            result = await db.execute(delete(OutboxEvent).where(OutboxEvent.sent_at < cutoff))
+            await db.commit()
+        return result.rowcount
+
+    async def update_backlog(self) -> None:
+        async with SessionLocal() as db:
+            count, oldest = (
+                await db.execute(
+                    select(func.count(), func.min(OutboxEvent.created_at)).where(
+                        OutboxEvent.sent_at.is_(None)
+                    )
+                )
+            ).one()
+        OUTBOX_BACKLOG.set(count)
+        OUTBOX_OLDEST_AGE.set((utcnow() - oldest).total_seconds() if oldest else 0)
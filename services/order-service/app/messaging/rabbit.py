@@ -1,38 +1,106 @@
+import asyncio
+import itertools
 import json
+import time
 from typing import Any
 
 import aio_pika
 from aio_pika import ExchangeType
+from aio_pika.exceptions import (
+    AMQPConnectionError,
+    ChannelInvalidStateError,
+    ConnectionClosed,
+    DeliveryError,
+)
+
+from app.metrics import (
+    RABBIT_PUBLISH_IN_FLIGHT,
+    RABBIT_PUBLISH_LATENCY,
+    RABBIT_PUBLISH_NACKS,
+    RABBIT_PUBLISH_RETRIES,
+)
 
 EXCHANGE_NAME = "coffee.events"
 
+# ошибки, при которых брокер "моргнул": ждём переподключения connect_robust и повторяем
+RETRYABLE_ERRORS = (AMQPConnectionError, ChannelInvalidStateError, ConnectionClosed, ConnectionError)
+
 
 class RabbitPublisher:
-    def __init__(self, amqp_url: str):
+    def __init__(
+        self,
+        amqp_url: str,
+        channel_pool_size: int = 4,
+        max_in_flight: int = 500,
+        unavailable_timeout: float = 30.0,
+    ):
         self.amqp_url = amqp_url
+        self.channel_pool_size = channel_pool_size
+        # сколько публикаций (в полёте + ждущих брокера) держим локально;
+        # сверх этого publish() ждёт — это и есть backpressure
+        self.max_in_flight = max_in_flight
+        self.unavailable_timeout = unavailable_timeout
+
         self.connection: aio_pika.RobustConnection | None = None
-        self.channel: aio_pika.RobustChannel | None = None
-        self.exchange: aio_pika.Exchange | None = None
+        self.channels: list[aio_pika.RobustChannel] = []
+        self.exchanges: list[aio_pika.Exchange] = []
+
+        self._next_exchange = None
+        self._slots = asyncio.Semaphore(max_in_flight)
 
     async def connect(self) -> None:
         self.connection = await aio_pika.connect_robust(self.amqp_url)
-        self.channel = await self.connection.channel()
-        self.exchange = await self.channel.declare_exchange(
-            EXCHANGE_NAME, ExchangeType.TOPIC, durable=True
-        )
+        for _ in range(self.channel_pool_size):
+            channel = await self.connection.channel(publisher_confirms=True)
+            exchange = await channel.declare_exchange(
+                EXCHANGE_NAME, ExchangeType.TOPIC, durable=True
+            )
+            self.channels.append(channel)
+            self.exchanges.append(exchange)
+        self._next_exchange = itertools.cycle(self.exchanges)
 
     async def close(self) -> None:
         if self.connection:
             await self.connection.close()
 
     async def publish(self, routing_key: str, payload: dict[str, Any]) -> None:
-        if not self.exchange:
+        if not self.exchanges:
             raise RuntimeError("RabbitPublisher not connected")
 
         body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        msg = aio_pika.Message(
-            body=body,
-            content_type="application/json",
-            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-        )
-        await self.exchange.publish(msg, routing_key=routing_key)
+
+        async with self._slots:
+            RABBIT_PUBLISH_IN_FLIGHT.inc()
+            start = time.perf_counter()
+            try:
+                await self._publish_with_retry(routing_key, body)
+            finally:
+                RABBIT_PUBLISH_IN_FLIGHT.dec()
+                RABBIT_PUBLISH_LATENCY.labels(routing_key=routing_key).observe(time.perf_counter() - start)
+
+    async def publish_many(self, events: list[tuple[str, dict[str, Any]]]) -> None:
+        # все сообщения уходят в конвейер сразу, подтверждения ждём вместе
+        await asyncio.gather(*(self.publish(rk, payload) for rk, payload in events))
+
+    async def _publish_with_retry(self, routing_key: str, body: bytes) -> None:
+        deadline = time.monotonic() + self.unavailable_timeout
+        delay = 0.1
+        while True:
+            msg = aio_pika.Message(
+                body=body,
+                content_type="application/json",
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            )
+            exchange = next(self._next_exchange)
+            try:
+                await exchange.publish(msg, routing_key=routing_key)
+                return
+            except DeliveryError:
+                RABBIT_PUBLISH_NACKS.labels(routing_key=routing_key).inc()
+                raise
+            except RETRYABLE_ERRORS:
+                if time.monotonic() + delay > deadline:
+                    raise
+                RABBIT_PUBLISH_RETRIES.labels(routing_key=routing_key).inc()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2.0)
@@ -1,7 +1,110 @@
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
 
 ORDERS_CREATED = Counter(
     "orders_created_total",
     "Total created orders",
     ["channel"],
 )
+
+# пул HTTP-клиента к menu-service
+MENU_HTTP_LATENCY = Histogram(
+    "menu_client_request_duration_seconds",
+    "Latency of requests from order-service to menu-service (seconds)",
+    ["endpoint", "status"],
+)
+
+MENU_HTTP_IN_FLIGHT = Gauge(
+    "menu_client_in_flight_requests",
+    "Requests to menu-service currently holding a pooled connection",
+)
+
+MENU_HTTP_POOL_MAX = Gauge(
+    "menu_client_pool_max_connections",
+    "Configured max connections of the menu-service HTTP pool",
+)
+
+# кэш меню
+MENU_CACHE_HITS = Counter(
+    "menu_cache_hits_total",
+    "Menu cache lookups served from cache",
+)
+
+MENU_CACHE_MISSES = Counter(
+    "menu_cache_misses_total",
+    "Menu cache lookups that went to menu-service",
+)
+
+MENU_CACHE_STALE = Counter(
+    "menu_cache_stale_served_total",
+    "Expired menu cache entries served while menu-service was unavailable",
+)
+
+MENU_CACHE_EVICTIONS = Counter(
+    "menu_cache_evictions_total",
+    "Entries removed from the menu cache",
+    ["reason"],
+)
+
+# outbox relay
+OUTBOX_PUBLISHED = Counter(
+    "outbox_events_published_total",
+    "Outbox events published to RabbitMQ and marked as sent",
+)
+
+OUTBOX_PUBLISH_FAILURES = Counter(
+    "outbox_relay_failures_total",
+    "Outbox relay batches that failed and will be retried",
+)
+
+OUTBOX_BATCH_SIZE = Histogram(
+    "outbox_relay_batch_size",
+    "Events published per relay batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500),
+)
+
+OUTBOX_BACKLOG = Gauge(
+    "outbox_backlog_events",
+    "Outbox events not yet published",
+)
+
+OUTBOX_OLDEST_AGE = Gauge(
+    "outbox_backlog_oldest_age_seconds",
+    "Age of the oldest unpublished outbox event (seconds)",
+)
+
+# публикация в RabbitMQ
+RABBIT_PUBLISH_LATENCY = Histogram(
+    "rabbit_publish_duration_seconds",
+    "Time from publish call to broker confirm (seconds)",
+    ["routing_key"],
+)
+
+RABBIT_PUBLISH_IN_FLIGHT = Gauge(
+    "rabbit_publish_in_flight",
+    "Publishes awaiting broker confirm or retrying",
+)
+
+RABBIT_PUBLISH_NACKS = Counter(
+    "rabbit_publish_nacks_total",
+    "Publishes negatively acknowledged by the broker",
+    ["routing_key"],
+)
+
+RABBIT_PUBLISH_RETRIES = Counter(
+    "rabbit_publish_retries_total",
+    "Publish attempts retried while the broker was unavailable",
+    ["routing_key"],
+)
+
+IDEMPOTENT_REPLAYS = Counter(
+    "orders_idempotent_replays_total",
+    "POST /orders requests answered from a stored Idempotency-Key response",
+)
+
+# задержка event loop: растёт, если кто-то блокирует loop синхронной работой
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop wakes up a periodic sleep (seconds)",
+    ["service"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
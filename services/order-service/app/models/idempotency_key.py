@@ -0,0 +1,32 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, JSON, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    idempotency_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    # ключ уникален в рамках пользователя
+    customer_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+
+    # sha256 тела запроса: тот же ключ с другим телом — ошибка клиента
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    order_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    response: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("customer_id", "key", name="uq_idempotency_keys_customer_key"),
+        # периодическая чистка протухших ключей идёт по created_at
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, Numeric
+from sqlalchemy import String, DateTime, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -30,3 +30,9 @@ class Order(Base):
         cascade="all, delete-orphan",
         lazy="selectin",
     )
+
+    __table_args__ = (
+        # keyset-пагинация: история клиента и общий список, оба по (created_at, order_id) DESC
+        Index("ix_orders_customer_created", "customer_id", created_at.desc(), order_id.desc()),
+        Index("ix_orders_created", created_at.desc(), order_id.desc()),
+    )
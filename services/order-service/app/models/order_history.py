@@ -0,0 +1,39 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, Numeric, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class OrderHistory(Base):
+    """Денормализованная история заказов клиента: заказ + позиции + статус кухни в одной строке.
+
+    Строка создаётся в транзакции заказа, статус кухни обновляют события kitchen.*.
+    """
+
+    __tablename__ = "order_history"
+
+    order_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    customer_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    channel: Mapped[str] = mapped_column(String, nullable=False)
+    total_price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+
+    # снимок позиций: [{menu_item_id, quantity, unit_price}]
+    items: Mapped[list] = mapped_column(JSON, nullable=False)
+
+    kitchen_status: Mapped[str] = mapped_column(String, nullable=False, default="NEW")
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_order_history_customer_created", "customer_id", created_at.desc(), order_id.desc()),
+    )
@@ -1,4 +1,5 @@
 from uuid import UUID
+from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 
 ALLOWED_CHANNELS = {"IN_STORE", "WEB", "MOBILE", "POS"}
@@ -41,3 +42,34 @@ class OrderOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class OrderSummaryOut(BaseModel):
+    order_id: UUID
+    status: str
+    channel: str
+    total_price: float
+    items: list[OrderItemOut]
+    kitchen_status: str
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class OrderBatchEntry(OrderCreate):
+    # ключ заказа на терминале: повторная досылка не создаст дубль
+    idempotency_key: str | None = Field(default=None, max_length=255)
+
+
+class OrderBatchCreate(BaseModel):
+    orders: list[OrderBatchEntry] = Field(min_length=1, max_length=500)
+
+
+class OrderBatchResult(BaseModel):
+    index: int
+    status: str  # CREATED | REPLAYED | FAILED
+    order: OrderOut | None = None
+    error: str | None = None
@@ -0,0 +1,42 @@
+import json
+from uuid import uuid4
+
+import httpx
+
+from app.integrations.menu_client import BATCH_MAX_IDS, MenuClient
+from tests.conftest import run
+
+
+def _client(calls: list[list[str]]) -> MenuClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        ids = json.loads(request.content)["menu_item_ids"]
+        calls.append(ids)
+        if len(ids) > BATCH_MAX_IDS:
+            return httpx.Response(422, json={"detail": "too many ids"})
+        return httpx.Response(200, json=[{"menu_item_id": i, "price": "1.00"} for i in ids])
+
+    client = MenuClient()
+    client.client = httpx.AsyncClient(base_url="http://menu", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_get_items_splits_large_batches():
+    calls: list[list[str]] = []
+    client = _client(calls)
+    ids = [uuid4() for _ in range(BATCH_MAX_IDS * 2 + 1)]
+
+    items = run(client.get_items(ids + ids[:10]))
+
+    assert [len(c) for c in calls] == [BATCH_MAX_IDS, BATCH_MAX_IDS, 1]
+    assert set(items) == {str(i) for i in ids}
+
+
+def test_get_items_single_request_for_small_order():
+    calls: list[list[str]] = []
+    client = _client(calls)
+    ids = [uuid4(), uuid4()]
+
+    items = run(client.get_items(ids))
+
+    assert len(calls) == 1
+    assert list(items) == [str(i) for i in ids]
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.messaging.outbox import OutboxRelay, utcnow
+from app.models.outbox_event import OutboxEvent
+from tests.conftest import run
+
+
+def test_purge_sent_removes_only_old_sent_events(db_tables):
+    now = utcnow()
+
+    async def scenario():
+        async with SessionLocal() as db:
+            db.add_all(
+                [
+                    OutboxEvent(routing_key="order.created", payload={"n": "old"}, sent_at=now - timedelta(days=8)),
+                    OutboxEvent(routing_key="order.created", payload={"n": "recent"}, sent_at=now - timedelta(hours=1)),
+                    OutboxEvent(routing_key="order.created", payload={"n": "unsent"}, sent_at=None),
+                ]
+            )
+            await db.commit()
+
+        relay = OutboxRelay(publisher=None, retention=7 * 86400)
+        purged = await relay.purge_sent()
+
+        async with SessionLocal() as db:
+            left = (await db.scalars(select(OutboxEvent.payload))).all()
+        return purged, sorted(p["n"] for p in left)
+
+    purged, left = run(scenario())
+    assert purged == 1
+    assert left == ["recent", "unsent"]
+
+
+def test_maybe_purge_runs_once_per_interval(db_tables):
+    async def scenario():
+        relay = OutboxRelay(publisher=None, purge_interval=3600)
+        calls = []
+
+        async def fake_purge():
+            calls.append(1)
+            return 0
+
+        relay.purge_sent = fake_purge
+        await relay.maybe_purge()
+        await relay.maybe_purge()
+        return len(calls)
+
+    assert run(scenario()) == 1
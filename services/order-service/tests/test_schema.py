@@ -0,0 +1,29 @@
+from sqlalchemy import inspect, text
+
+from app.db.base import Base
+from app.db.schema import ensure_indexes
+from app.db.session import engine
+from tests.conftest import run
+
+
+def index_names(conn, table: str) -> set[str]:
+    return {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def test_ensure_indexes_adds_missing_indexes_to_existing_tables(db_tables):
+    async def scenario():
+        async with engine.begin() as conn:
+            # таблица из старой схемы: индексов keyset-пагинации ещё нет
+            await conn.execute(text("DROP INDEX ix_orders_customer_created"))
+            await conn.execute(text("DROP INDEX ix_orders_created"))
+            before = await conn.run_sync(index_names, "orders")
+
+            await conn.run_sync(ensure_indexes, Base.metadata)
+            # второй прогон на актуальной схеме ничего не делает и не падает
+            await conn.run_sync(ensure_indexes, Base.metadata)
+            after = await conn.run_sync(index_names, "orders")
+        return before, after
+
+    before, after = run(scenario())
+    assert "ix_orders_customer_created" not in before
+    assert {"ix_orders_customer_created", "ix_orders_created"} <= after